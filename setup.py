@@ -55,7 +55,10 @@ setup(name='wavytool',
                                       '*.ui']},
       entry_points={
           "gui_scripts": [
-              "wavytool=wavytool.__main__:main"]},
+              "wavytool=wavytool.__main__:main"],
+          # The commands need a console, which gui_scripts do not have on Windows
+          "console_scripts": [
+              "wavytool-cli=wavytool.cli_wavy:main"]},
       install_requires=['qtpy>=1.4',
                         'numpy>=1.13',
                         'pyqtgraph>=0.10',
@@ -3,7 +3,21 @@
 
 import sys
 
-from wavytool.gui_wavy import main
+from wavytool.cli_wavy import commands
+from wavytool.cli_wavy import main as cli_main
+
+
+def main():
+    """Runs a command line command if given, the graphical interface otherwise."""
+
+    # The graphical interface is imported just when needed, so commands run without Qt
+    if sys.argv[1:2] and sys.argv[1] in commands:
+        return cli_main(sys.argv[1:])
+
+    from wavytool.gui_wavy import main as gui_main
+
+    return gui_main()
+
 
 if __name__ == '__main__':
     sys.exit(main())
@@ -0,0 +1,358 @@
+#! python
+# -*- coding: utf-8 -*-
+
+"""
+Command line interface of WavyTool, it records data from input devices
+(or synthetic and file sources) straight to disk without the graphical
+interface, e.g. over SSH:
+
+    $ wavytool record --duration 60 --format csv
+
+also unattended, e.g. a 30 s run every 10 minutes:
+
+    $ wavytool record --duration 30 --every 600 --runs 6
+
+and lists the input devices to choose from:
+
+    $ wavytool devices
+
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+
+from wavytool import __version__ as version
+from wavytool import app_name
+from wavytool.core_wavy import (AlignedSource, AudioCapture, AudioRecord, FileSource, Gap, ProcessCapture,
+                                SampleDecoder, Schedule, SyntheticSource, Trigger, TriggerGate, input_devices, pyaudio,
+                                save_gaps, writers)
+
+# Commands handled here instead of opening the graphical interface
+commands = ['record', 'devices']
+
+
+def data_folder():
+    """Returns the data folder chosen in the graphical interface, or the current one."""
+    try:
+        with open('wavytool.config', 'r') as json_file:
+            return json.load(json_file)['data_folder']
+    except (IOError, KeyError, ValueError):
+        return '.'
+
+
+def source_from(args):
+    """Creates the acquisition source chosen in the arguments."""
+    realtime = not args.fast
+    if args.source == 'synthetic':
+        return SyntheticSource(args.interval, args.rate or 44100, args.channels, frequency=args.frequency,
+                               amplitude=args.amplitude, noise=args.noise, damping=args.damping,
+                               realtime=realtime)
+    if args.source == 'file':
+        return FileSource(args.input, args.interval, args.rate, realtime=realtime)
+    devices = args.device or [None]
+    sources = [AudioRecord(args.output, args.interval, rate=args.rate, channels=args.channels,
+                           sample_format=args.sample_format, device=device) for device in devices]
+    if len(sources) == 1:
+        return sources[0]
+    # Several devices are recorded together, at the rate of the first one
+    return AlignedSource(sources, args.interval, args.rate, process=args.process)
+
+
+def captured(source, interval, gaps=None, process=False):
+    """Yields the blocks read from a source until its end (or Ctrl+C).
+
+    Real time sources are read on a capture thread, or process, so writing
+    to disk never delays the input device; the others are read as fast as
+    they are written. Frames lost on the way (see AudioCapture) are added
+    to gaps, if given.
+    """
+    if not source.realtime:
+        source.open()
+        try:
+            while True:
+                try:
+                    yield source.read()
+                except EOFError:
+                    return
+        finally:
+            source.close()
+
+    # Aligned sources capture each device on a process themselves, they hold their captures
+    if isinstance(source, AlignedSource):
+        process = False
+    capture = ProcessCapture(source) if process else AudioCapture(source)
+    capture.start()
+    reader = capture.ring.reader(0)
+    try:
+        while capture.is_running() or reader.available():
+            time.sleep(interval)
+            cursor, lost = reader.cursor, reader.lost
+            views = reader.read()
+            if reader.lost > lost and gaps is not None:
+                # Disk was too slow and the ring buffer went around
+                gaps.append(Gap(cursor, reader.lost - lost, 'overrun'))
+            for view in views:
+                yield view
+    finally:
+        capture.close()
+        if gaps is not None:
+            gaps.extend(capture.gaps)
+            gaps.sort()
+
+
+def open_writer(fmt, filepath, source, args):
+    """Opens the writer of the format for the source."""
+    if fmt == 'wav':
+        # WAVE files keep the resolution of the capture format
+        return writers[fmt](filepath, source.rate, source.channels, split=args.split, sample_format=args.sample_format)
+    return writers[fmt](filepath, source.rate, source.channels)
+
+
+def record_file(args, fmt, source, blocks, block):
+    """Writes the blocks to the output file, until the duration."""
+    writer = open_writer(fmt, args.output, source, args)
+    # Counted in frames, one sample per channel
+    total = int(args.duration * source.rate)
+    written = 0
+    logging.info('Recording %s channel(s) at %d Hz to %s', source.channels, source.rate, args.output)
+
+    try:
+        while block is not None and (total == 0 or written < total):
+            if total:
+                block = block[:total - written]
+            writer.write(block)
+            written += block.shape[0]
+            block = next(blocks, None)
+    finally:
+        writer.close()
+        logging.info('Recorded %.3f s to %s', written / float(source.rate), args.output)
+
+
+def record_runs(args, fmt, source, blocks, block):
+    """Writes each run started by the trigger to its own file.
+
+    Files are named after the output, e.g. data_001.wav, data_002.wav, and
+    each one starts with the pre-trigger time. A run lasts the duration or,
+    without one, until the signal stays back past the threshold for the
+    hold time.
+    """
+    trigger = Trigger(args.threshold, args.trigger, args.edge, source.rate, rms_time=args.rms_time)
+    gate = TriggerGate(trigger, source.rate, args.pre_trigger, args.duration, args.hold)
+    base, ext = os.path.splitext(args.output)
+    writer = None
+    logging.info('Waiting for the trigger on %s channel(s) at %d Hz', source.channels, source.rate)
+
+    try:
+        while block is not None:
+            for event in gate.process(block):
+                if event.kind == 'start':
+                    filepath = '{}_{:03d}{}'.format(base, gate.runs, ext)
+                    writer = open_writer(fmt, filepath, source, args)
+                    logging.info('Triggered at %.3f s, recording to %s',
+                                 (event.frame + event.samples.shape[0]) / float(source.rate), filepath)
+                if event.samples.shape[0]:
+                    writer.write(event.samples)
+                if event.kind == 'stop':
+                    writer.close()
+                    writer = None
+                    logging.info('Recorded run %d to %s', gate.runs, filepath)
+                    if args.runs and gate.runs >= args.runs:
+                        return
+            block = next(blocks, None)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def record_source(args, fmt):
+    """Records from the source to the output, see record."""
+    source = source_from(args)
+    gaps = []
+    blocks = captured(source, args.interval, gaps, args.process)
+    try:
+        # The source is opened with the first block, so rate and channels are known
+        first = next(blocks, None)
+    except (IOError, ValueError) as err:
+        logging.error('Problem opening the source: %s', str(err))
+        return 1
+
+    try:
+        if args.trigger:
+            record_runs(args, fmt, source, blocks, first)
+        else:
+            record_file(args, fmt, source, blocks, first)
+    finally:
+        blocks.close()
+        if gaps:
+            # Frames are counted as captured, the ones overrun included
+            gaps_path = os.path.splitext(args.output)[0] + '.gaps.csv'
+            save_gaps(gaps_path, gaps, source.rate)
+            logging.warning('%d gap(s), about %d frames lost, see %s', len(gaps), sum(gap.lost for gap in gaps),
+                            gaps_path)
+        if isinstance(source, AlignedSource):
+            for device, drift in zip(args.device, source.drift()):
+                if drift is not None:
+                    logging.info('Clock drift of device %d: %.1f ppm', device, drift)
+    return 0
+
+
+def record_scheduled(args, fmt, schedule):
+    """Records each run of the schedule to its own file, e.g. data_001.wav, data_002.wav.
+
+    The source is opened for each run and closed until the next one, so
+    waiting takes no CPU.
+    """
+    base, ext = os.path.splitext(args.output)
+    run = schedule.next_run()
+    while run is not None:
+        start, stop = run
+        logging.info('Run %d from %s to %s', schedule.index, time.ctime(start), time.ctime(stop))
+        time.sleep(max(start - time.time(), 0))
+        # Late runs (e.g. the previous one overran) still stop on time
+        duration = schedule.duration
+        if time.time() > start + args.interval:
+            duration = stop - time.time()
+        run_args = argparse.Namespace(**dict(vars(args), output='{}_{:03d}{}'.format(base, schedule.index, ext),
+                                             duration=duration))
+        status = record_source(run_args, fmt)
+        if status:
+            return status
+        run = schedule.next_run()
+    logging.info('All runs recorded.')
+    return 0
+
+
+def record(args):
+    """Records from the source to a file, until the duration, the end of the source or Ctrl+C."""
+    fmt = args.format
+    if fmt is None:
+        fmt = os.path.splitext(args.output)[1][1:].lower() if args.output else 'wav'
+    if fmt not in writers:
+        logging.error('Unknown output format: %s', fmt)
+        return 2
+
+    if not args.output:
+        filename = 'new_wavy_data_' + time.strftime("%Y%m%d%H%M%S", time.gmtime()) + '.' + fmt
+        args.output = os.path.join(data_folder(), filename)
+
+    if args.source == 'file' and not args.input:
+        logging.error('The file source needs an input file, see --input.')
+        return 2
+
+    schedule = None
+    if args.every is not None or args.cron is not None:
+        if args.trigger:
+            logging.error('A schedule cannot be used with a trigger.')
+            return 2
+        try:
+            schedule = Schedule(args.duration, args.every, args.runs, args.cron)
+        except ValueError as err:
+            logging.error('Problem with the schedule: %s', str(err))
+            return 2
+
+    try:
+        if schedule is not None:
+            return record_scheduled(args, fmt, schedule)
+        return record_source(args, fmt)
+    except KeyboardInterrupt:
+        logging.info('Recording interrupted.')
+        return 0
+
+
+def devices(args):
+    """Lists the input devices, with their supported rates, channels and latency."""
+    if pyaudio is None:
+        logging.error("PyAudio is not installed, use 'pip install pyaudio' to install.")
+        return 1
+
+    for device in input_devices():
+        print('{:>3}  {} ({})'.format(device.index, device.name, device.host_api))
+        print('     channels: {}, latency: {:.1f} ms, default rate: {} Hz'.format(device.channels,
+                                                                                  device.latency * 1000,
+                                                                                  device.default_rate))
+        print('     rates: {}'.format(', '.join(str(rate) for rate in device.rates) or 'none of the standard ones'))
+    return 0
+
+
+def main(args=None):
+    """The main function of the command line interface."""
+
+    parser = argparse.ArgumentParser(prog='wavytool',
+                                     description='{} {} command line interface.'.format(app_name, version))
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    parser_record = subparsers.add_parser('record', help='record without the interface')
+    parser_record.add_argument('-d', '--duration', type=float, default=0.,
+                               help='recording time in seconds, 0 records until Ctrl+C, the time of each run '
+                                    'with --trigger (default: %(default)s)')
+    parser_record.add_argument('-r', '--rate', type=int, default=None,
+                               help="sample rate in Hz, the highest supported one if it is not "
+                                    "(default: the soundcard's prefered rate)")
+    parser_record.add_argument('-c', '--channels', type=int, default=1,
+                               help='number of channels (default: %(default)s)')
+    parser_record.add_argument('--device', type=int, action='append', default=None,
+                               help='index of the input device, see devices, repeat it to record several devices '
+                                    'together (default: the default input device)')
+    parser_record.add_argument('--sample-format', choices=sorted(SampleDecoder.formats), default='int16',
+                               help='capture format of the input device, and of wav files (default: %(default)s)')
+    parser_record.add_argument('-f', '--format', choices=sorted(writers), default=None,
+                               help='output format (default: from the output extension, or wav)')
+    parser_record.add_argument('-o', '--output', default=None,
+                               help='output file (default: new file in the data folder)')
+    parser_record.add_argument('--split', action='store_true',
+                               help='splits wav files past 4 GB in several files, instead of writing RF64')
+    parser_record.add_argument('-i', '--interval', type=float, default=0.1,
+                               help='time in seconds read and written at once (default: %(default)s)')
+    parser_record.add_argument('-s', '--source', choices=['audio', 'synthetic', 'file'], default='audio',
+                               help='where data comes from (default: %(default)s, the input device)')
+    parser_record.add_argument('--input', default=None,
+                               help='wav or npy file replayed by the file source, npy needs --rate')
+    parser_record.add_argument('--process', action='store_true',
+                               help='captures on its own process, so the rest never delays the input device')
+    parser_record.add_argument('--fast', action='store_true',
+                               help='reads synthetic and file sources as fast as possible, not in real time')
+    parser_record.add_argument('--frequency', type=float, default=5.,
+                               help='frequency in Hz of the synthetic source (default: %(default)s)')
+    parser_record.add_argument('--amplitude', type=float, default=1.,
+                               help='amplitude in volts of the synthetic source (default: %(default)s)')
+    parser_record.add_argument('--noise', type=float, default=0.,
+                               help='noise in volts of the synthetic source (default: %(default)s)')
+    parser_record.add_argument('--damping', type=float, default=0.,
+                               help='damping rate in 1/s of the synthetic source (default: %(default)s)')
+    parser_record.add_argument('--trigger', choices=Trigger.modes, default=None,
+                               help='records just the runs started by the first channel crossing the threshold, '
+                                    'each one to its own file (default: records everything)')
+    parser_record.add_argument('--threshold', type=float, default=0.5,
+                               help='trigger threshold, in V, V/s for slope (default: %(default)s)')
+    parser_record.add_argument('--edge', choices=Trigger.edges, default='rising',
+                               help='crossing direction of the trigger (default: %(default)s)')
+    parser_record.add_argument('--rms-time', type=float, default=0.01,
+                               help='rms window of the trigger in seconds (default: %(default)s)')
+    parser_record.add_argument('--pre-trigger', type=float, default=0.5,
+                               help='time in seconds kept before the trigger (default: %(default)s)')
+    parser_record.add_argument('--hold', type=float, default=1.,
+                               help='time in seconds back past the threshold that ends a run, without a duration '
+                                    '(default: %(default)s)')
+    parser_record.add_argument('--runs', type=int, default=0,
+                               help='number of runs recorded, triggered or scheduled, 0 records until Ctrl+C '
+                                    '(default: %(default)s)')
+    parser_record.add_argument('--every', type=float, default=None,
+                               help='records a run of --duration seconds every this many seconds, each one to its '
+                                    'own file (default: records once)')
+    parser_record.add_argument('--cron', default=None,
+                               help="records a run of --duration seconds at the times matching a cron expression, "
+                                    "e.g. '*/15 8-18 * * 1-5', each one to its own file (default: records once)")
+    parser_record.set_defaults(function=record)
+
+    parser_devices = subparsers.add_parser('devices', help='list the input devices')
+    parser_devices.set_defaults(function=devices)
+
+    args = parser.parse_args(args)
+
+    logging.basicConfig(level=logging.INFO)
+
+    return args.function(args)
@@ -1,63 +1,357 @@
 #! python
 # -*- coding: utf-8 -*-
 
+import asyncio
+import collections
+import concurrent.futures
+import datetime
+import fractions
+import json
+import logging
+import math
+import multiprocessing
+import os
+import signal
+import struct
+import tempfile
+import threading
+import time
 import wave
+import zlib
 
 import numpy
 
-import pyaudio
+# PyAudio is needed just to read from input devices
+try:
+    import pyaudio
+except ImportError:
+    pyaudio = None
 
+# Shared memory is needed just to capture on another process, see ProcessCapture
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    shared_memory = None
 
-class AudioRecord():
-    """Class to record audio data."""
-    def __init__(self, filename="output.wav", interval=1):
-        self.outputFilename = filename
-        self.rate = 22050
+# Amplitude (in volts) of a full scale sample
+FULL_SCALE = 5.0
+
+# Sample rates (in Hz) checked on input devices
+STANDARD_RATES = [8000, 11025, 16000, 22050, 32000, 44100, 48000, 88200, 96000, 176400, 192000]
+
+
+class SampleDecoder():
+    """Decodes raw sample buffers to volts, without allocating at each call.
+
+    The buffer is viewed in place with numpy.frombuffer and scaled into a
+    preallocated array with in place ufuncs, so the returned array is
+    reused by the next call: copy it to keep it.
+
+    Parameters:
+        sample_format (str): 'int16', 'int24', 'int32' or 'float32'. Default 'int16'.
+        size (int): initial number of samples decoded at once. Default 1024.
+    """
+
+    # Bytes per sample, numpy type and full scale value of each format
+    formats = {'int16': (2, '<i2', 2 ** 15),
+               'int24': (3, None, 2 ** 23),
+               'int32': (4, '<i4', 2 ** 31),
+               'float32': (4, '<f4', 1.)}
+
+    def __init__(self, sample_format='int16', size=1024):
+        if sample_format not in self.formats:
+            raise ValueError('Unknown sample format: {}'.format(sample_format))
+        self.sample_format = sample_format
+        self.width, self.dtype, full_scale = self.formats[sample_format]
+        self.scale = FULL_SCALE / full_scale
+        self._out = numpy.empty(size, dtype=numpy.float64)
+        # Packed 24 bits samples are unpacked to 32 bits here
+        self._unpacked = numpy.empty(size if sample_format == 'int24' else 0, dtype='<i4')
+
+    def decode(self, data):
+        """Returns the samples of a buffer, in volts.
+
+        Parameters:
+            data (bytes): little endian samples, interleaved when there is more than one channel.
+        """
+        count = len(data) // self.width
+        if count > self._out.shape[0]:
+            self._out = numpy.empty(count, dtype=numpy.float64)
+            if self.sample_format == 'int24':
+                self._unpacked = numpy.empty(count, dtype='<i4')
+        out = self._out[:count]
+
+        if self.sample_format == 'int24':
+            # The 3 bytes go to the top of each int32, then shifting keeps the sign
+            unpacked = self._unpacked[:count]
+            unpacked_bytes = unpacked.view(numpy.uint8).reshape(count, 4)
+            unpacked_bytes[:, 0] = 0
+            unpacked_bytes[:, 1:] = numpy.frombuffer(data, dtype=numpy.uint8, count=3 * count).reshape(count, 3)
+            samples = numpy.right_shift(unpacked, 8, out=unpacked)
+        else:
+            samples = numpy.frombuffer(data, dtype=self.dtype, count=count)
+
+        return numpy.multiply(samples, self.scale, out=out)
+
+
+class Source():
+    """Base class of acquisition sources.
+
+    A source delivers chunks of samples, in volts, shaped (frames, channels)
+    with a frame per sample time. Subclasses set rate and chunk in open and
+    implement read.
+
+    Parameters:
+        interval (float): time (in seconds) read at each call. Default 1 second.
+        rate (int): sample rate, in Hz. Default 22050 Hz.
+        channels (int): number of channels. Default 1.
+    """
+
+    # Real time sources deliver data at the sample rate, the others as fast as they are read
+    realtime = True
+
+    def __init__(self, interval=1, rate=22050, channels=1):
         self.interval = interval
+        self.rate = rate
+        self.channels = channels
+        self.chunk = int(interval * rate)
+
+    def open(self):
+        """Opens the source, call it once before read."""
+
+    def read(self):
+        """Returns the next chunk of samples, shaped (frames, channels), blocking until it is available.
+
+        The array may be reused by the next call, copy it to keep it.
+        Raises EOFError when the source has no more data.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """Closes the source, call it once after read."""
+
+    def stream(self, timeout=None, buffer_time=10.):
+        """Returns an asynchronous iterator of the blocks of the source, see AsyncStream.
+
+        The source is opened with the first block, e.g.::
+
+            async with source.stream(timeout=1.) as blocks:
+                async for block in blocks:
+                    await writer.write(block)
+
+        Parameters:
+            timeout (float): most time (in seconds) waiting for a block. Default None, no limit.
+            buffer_time (float): time (in seconds) kept in the ring buffer of real time sources. Default 10 seconds.
+        """
+        return AsyncStream(self, timeout, buffer_time)
+
+    def reconfigure(self, interval=None, rate=None):
+        """Changes the time read at each call and/or the sample rate of an open source.
+
+        Parameters:
+            interval (float): time (in seconds) read at each call. Default None, unchanged.
+            rate (int): sample rate, in Hz. Default None, unchanged.
+        """
+        if interval is not None:
+            self.interval = interval
+        if rate is not None:
+            self.rate = rate
+        self.chunk = max(int(self.interval * self.rate), 1)
+
+
+# Input device, as listed by input_devices
+InputDevice = collections.namedtuple('InputDevice', ['index', 'name', 'host_api', 'channels',
+                                                     'default_rate', 'rates', 'latency'])
+
+
+def input_devices(port=None):
+    """Lists the input devices with their supported rates, channels and latency.
+
+    Parameters:
+        port (pyaudio.PyAudio): PyAudio already initialized. Default None, initialized just for this.
+
+    Returns:
+        list: InputDevice for each device with input channels, empty if PyAudio is not installed.
+    """
+    if pyaudio is None:
+        return []
+
+    own_port = port is None
+    if own_port:
+        port = pyaudio.PyAudio()
+    try:
+        devices = []
+        for index in range(port.get_device_count()):
+            info = port.get_device_info_by_index(index)
+            if info['maxInputChannels'] < 1:
+                continue
+            devices.append(InputDevice(index=index,
+                                       name=info['name'],
+                                       host_api=port.get_host_api_info_by_index(info['hostApi'])['name'],
+                                       channels=int(info['maxInputChannels']),
+                                       default_rate=int(info['defaultSampleRate']),
+                                       rates=supported_rates(port, index),
+                                       latency=info['defaultLowInputLatency']))
+        return devices
+    finally:
+        if own_port:
+            port.terminate()
+
+
+def supported_rates(port, device, channels=1, sample_format='int16'):
+    """Returns the standard sample rates supported by an input device.
+
+    Parameters:
+        port (pyaudio.PyAudio): PyAudio already initialized.
+        device (int): index of the input device.
+        channels (int): number of channels. Default 1.
+        sample_format (str): capture format. Default 'int16'.
+    """
+    input_format = getattr(pyaudio, AudioRecord.pyaudio_formats[sample_format])
+    rates = []
+    for rate in STANDARD_RATES:
+        try:
+            if port.is_format_supported(rate, input_device=device, input_channels=channels,
+                                        input_format=input_format):
+                rates.append(rate)
+        except ValueError:
+            # PyAudio raises instead of returning False for unsupported formats
+            pass
+    return rates
+
+
+class AudioRecord(Source):
+    """Class to record audio data.
+
+    Parameters:
+        filename (str): output file name. Default "output.wav".
+        interval (float): time (in seconds) read at each call. Default 1 second.
+        rate (int): sample rate, in Hz. Default None, the soundcard's prefered rate.
+        channels (int): number of channels. Default 1.
+        sample_format (str): capture format, 'int16', 'int24', 'int32' or 'float32'. Default 'int16'.
+        device (int): index of the input device, see input_devices. Default None, the default input device.
+    """
+    def __init__(self, filename="output.wav", interval=1, rate=None, channels=1, sample_format='int16',
+                 device=None):
+        super(AudioRecord, self).__init__(interval, 22050, channels)
+        self.outputFilename = filename
+        self.requested_rate = rate
         self.chunk = 1024
-        self.format = pyaudio.paInt16
-        self.channels = 1
+        self.sample_format = sample_format
+        self.decoder = SampleDecoder(sample_format)
+        self.format = getattr(pyaudio, self.pyaudio_formats[sample_format], None)
+        self.device = device
+        # Index of the device opened, known after begin_audio
+        self.device_index = None
         self.port = None
-        self.stream = None
+        self.input_stream = None
+
+    # Names of the PyAudio formats for each sample format
+    pyaudio_formats = {'int16': 'paInt16',
+                       'int24': 'paInt24',
+                       'int32': 'paInt32',
+                       'float32': 'paFloat32'}
+
+    def open(self):
+        self.begin_audio()
+
+    def read(self):
+        # The device interleaves channels, each frame is a line
+        return self.get_data_from_audio()[1].reshape(-1, self.channels)
+
+    def close(self):
+        self.end_audio()
+
+    def reconfigure(self, interval=None, rate=None):
+        # Restarts just the stream, PyAudio keeps initialized
+        self._close_stream()
+        if interval is not None:
+            self.interval = interval
+        if rate is not None:
+            self.requested_rate = rate
+        self.begin_audio()
 
     def begin_audio(self):
         # You must call this before get_data_from_audio, just ONCE
-        # Initializes just if there is no self.stream opened yet
-        if self.stream is None:
+        # Initializes just if there is no self.input_stream opened yet
+        if pyaudio is None:
+            raise IOError("PyAudio is not installed, use 'pip install pyaudio' to install.")
+
+        if self.port is None:
             self.port = pyaudio.PyAudio()
 
-            # Forces the soundcard's prefered sample rate
-            self.rate = int(self.port.get_device_info_by_index(0)['defaultSampleRate'])
+        if self.input_stream is None:
+            self.device_index = self.device if self.device is not None else self.default_device()
+            self.rate = self.choose_rate()
             self.chunk = int(self.interval * self.rate)
 
-            self.stream = self.port.open(format=self.format, channels=self.channels, rate=self.rate, input=True, frames_per_buffer=self.chunk)
-            self.stream.stop_stream()
+            # The stream keeps running until end_audio, so reads never wait for it to start
+            self.input_stream = self.port.open(format=self.format, channels=self.channels, rate=self.rate,
+                                               input=True, input_device_index=self.device_index,
+                                               frames_per_buffer=self.chunk)
+
+    def default_device(self):
+        """Returns the index of the default input device, or of the first one with input channels."""
+        try:
+            return self.port.get_default_input_device_info()['index']
+        except IOError:
+            for index in range(self.port.get_device_count()):
+                if self.port.get_device_info_by_index(index)['maxInputChannels'] > 0:
+                    return index
+        raise IOError('No input device found.')
+
+    def choose_rate(self):
+        """Returns the requested rate if the device supports it, or its best rate.
+
+        Without a requested rate the device's prefered rate is used. If that is
+        not supported either, it falls back to the highest supported rate, so
+        the device is not forced through a resampler or refused.
+        """
+        default_rate = int(self.port.get_device_info_by_index(self.device_index)['defaultSampleRate'])
+        wanted = int(self.requested_rate) if self.requested_rate else default_rate
+        rates = supported_rates(self.port, self.device_index, self.channels, self.sample_format)
+        # Non standard rates are not listed, if none is supported PyAudio tells when the stream opens
+        if wanted in rates or not rates:
+            return wanted
+        if wanted not in STANDARD_RATES:
+            try:
+                if self.port.is_format_supported(wanted, input_device=self.device_index,
+                                                 input_channels=self.channels, input_format=self.format):
+                    return wanted
+            except ValueError:
+                pass
+        logging.warning('Sample rate of %d Hz is not supported by the input device, using %d Hz.', wanted, rates[-1])
+        return rates[-1]
 
     def get_data_from_audio(self):
         # Before you call this function, you need to call - ONCE, begin_audio()
         # You will call this function every time you need new data
         # After you call this function you need to call end_audio(), ONCE!
 
-        data_array = numpy.zeros(self.chunk, dtype=numpy.float)
         data_stream = None
 
-        # If there is a self.stream opened
-        if self.stream is not None:
-            self.stream.start_stream()
-            # String of bytes
-            data_stream = self.stream.read(self.chunk)
-            # Array of float normalized 0 - 5V
-            data_array = (numpy.fromstring(data_stream, dtype=numpy.int16) / 32768.0) * 5.0
+        # If there is a self.input_stream opened
+        if self.input_stream is not None:
+            # String of bytes, an input overflow raises IOError (the chunk is
+            # dropped) so the capture knows data was lost
+            data_stream = self.input_stream.read(self.chunk, exception_on_overflow=True)
+            # Array of float normalized 0 - 5V, reused by the next call
+            data_array = self.decoder.decode(data_stream)
+        else:
+            data_array = numpy.zeros(self.chunk * self.channels, dtype=numpy.float64)
 
         return data_stream, data_array
 
+    def _close_stream(self):
+        # If there is a self.input_stream opened
+        if self.input_stream:
+            self.input_stream.stop_stream()
+            self.input_stream.close()
+            self.input_stream = None
+
     def end_audio(self):
         # You must call this after get_data_from_audio, just ONCE
-        # If there is a self.stream opened
-        if self.stream:
-            self.stream.stop_stream()
-            self.stream.close()
-            self.stream = None
+        self._close_stream()
         # Terminate the self.port connection - important
         try:
             self.port.terminate()
@@ -67,10 +361,2284 @@ class AudioRecord():
             self.port = None
 
     def save_wave(self, frames):
-
+        # Frames are the bytes read from the stream, written one by one
+        # so they are never joined in memory, the header is set on close
         wf = wave.open(self.outputFilename, 'wb')
         wf.setnchannels(self.channels)
-        wf.setsampwidth(self.port.get_sample_size(self.format))
-        wf.setframe(self.rate)
-        wf.writeframes(b''.join(frames))
+        wf.setsampwidth(self.decoder.width)
+        wf.setframerate(self.rate)
+        for frame in frames:
+            wf.writeframesraw(frame)
         wf.close()
+
+
+def frames_shape(size, channels=None):
+    """Returns the shape of an array of samples, (size,) or (size, channels).
+
+    Parameters:
+        size (int): number of samples (frames, when there are channels).
+        channels (int): number of channels. Default None, one dimensional samples.
+    """
+    return (size,) if channels is None else (size, channels)
+
+
+def csv_header(channels=None):
+    """Returns the header of a csv file with a time column and a column per channel.
+
+    Parameters:
+        channels (int): number of channels. Default None, one amplitude column.
+    """
+    if channels is None or channels == 1:
+        return 'time,amplitude'
+    return 'time,' + ','.join('channel{}'.format(channel) for channel in range(channels))
+
+
+class RingBuffer():
+    """Preallocated circular buffer filled by one writer thread.
+
+    Every sample gets a sequence number (its position since creation), and
+    ``written`` is the sequence number of the next one. The writer copies
+    the block in place and only then advances ``written``, so readers never
+    need a lock: anything older than the counter they read is already in
+    the array. Each consumer keeps its own cursor, see reader.
+
+    With channels, samples are frames shaped (size, channels) and sequence
+    numbers count frames.
+
+    Parameters:
+        size (int): number of samples kept. Default 65536.
+        dtype (numpy.dtype): sample type. Default numpy.float64.
+        channels (int): number of channels. Default None, one dimensional samples.
+    """
+
+    def __init__(self, size=65536, dtype=numpy.float64, channels=None):
+        self.size = int(size)
+        self.dtype = numpy.dtype(dtype)
+        self.channels = channels
+        self.data = numpy.zeros(frames_shape(self.size, channels), dtype=self.dtype)
+        # Total of samples written since creation, never wraps
+        self.written = 0
+
+    def write(self, block):
+        """Copies a block of samples into the buffer.
+
+        Parameters:
+            block (numpy.ndarray): samples to append.
+        """
+        block = numpy.asarray(block)
+        written = self.written + block.shape[0]
+        # Just the newest samples fit when the block is too large
+        if block.shape[0] > self.size:
+            block = block[-self.size:]
+        start = (written - block.shape[0]) % self.size
+        end = start + block.shape[0]
+        if end <= self.size:
+            self.data[start:end] = block
+        else:
+            split = self.size - start
+            self.data[start:] = block[:split]
+            self.data[:end - self.size] = block[split:]
+        # Publish the new samples only after they are in place
+        self.written = written
+
+    def latest(self, count):
+        """Returns a copy of the newest samples, the oldest first.
+
+        Parameters:
+            count (int): number of samples, at most the buffer size.
+        """
+        count = min(int(count), self.size)
+        end = self.written % self.size
+        if count <= end:
+            return self.data[end - count:end].copy()
+        return numpy.concatenate((self.data[self.size - (count - end):], self.data[:end]))
+
+    def read_since(self, cursor):
+        """Returns the samples written since a sequence number, without copying.
+
+        The views are valid until the writer goes around the buffer again,
+        so copy them (or use them) right away.
+
+        Parameters:
+            cursor (int): sequence number of the first sample wanted.
+
+        Returns:
+            tuple: (views, cursor, lost), where views is a tuple with one or
+            two arrays (two when the samples wrap at the end of the buffer),
+            cursor is the sequence number to use in the next call and lost is
+            the number of samples overwritten before being read.
+        """
+        written = self.written
+        lost = max(written - cursor - self.size, 0)
+        cursor += lost
+        start = cursor % self.size
+        end = start + written - cursor
+        if end <= self.size:
+            views = (self.data[start:end],)
+        else:
+            views = (self.data[start:], self.data[:end - self.size])
+        return views, written, lost
+
+    def reader(self, cursor=None):
+        """Creates a reader with its own cursor.
+
+        Parameters:
+            cursor (int): first sequence number to read. Default None, just
+                the samples written from now on.
+        """
+        return RingReader(self, self.written if cursor is None else cursor)
+
+
+class RingReader():
+    """Reads a ring buffer from its own cursor, one per consumer.
+
+    Parameters:
+        ring (RingBuffer): buffer to read.
+        cursor (int): sequence number of the next sample to read.
+    """
+
+    def __init__(self, ring, cursor=0):
+        self.ring = ring
+        self.cursor = cursor
+        # Total of samples overwritten before this reader got them
+        self.lost = 0
+
+    def available(self):
+        """Returns the number of samples waiting to be read."""
+        return min(self.ring.written - self.cursor, self.ring.size)
+
+    def read(self):
+        """Returns views of the samples written since the last read, see RingBuffer.read_since."""
+        views, self.cursor, lost = self.ring.read_since(self.cursor)
+        if lost:
+            self.lost += lost
+            logging.warning('Ring buffer overrun, %d samples were lost.', lost)
+        return views
+
+    def skip(self):
+        """Moves the cursor to the newest sample, ignoring what is waiting."""
+        self.cursor = self.ring.written
+
+
+class SharedRingBuffer(RingBuffer):
+    """Ring buffer in shared memory, written by one process and read by others.
+
+    The samples and the sequence counter (written) are kept in a
+    multiprocessing.shared_memory block, so other processes attached to it
+    by name read the samples in place, with their own readers. As in
+    RingBuffer, the writer advances the counter only after the samples are
+    in place.
+
+    The process that creates the block releases it with close; the others
+    just detach.
+
+    Parameters:
+        size (int): number of samples kept. Default 65536.
+        dtype (numpy.dtype): sample type. Default numpy.float64.
+        channels (int): number of channels. Default None, one dimensional samples.
+        name (str): name of a block to attach to, its size, type and channels
+            are used. Default None, creates a new block.
+    """
+
+    # Counter, size, channels and the type of the samples
+    header_size = 64
+
+    def __init__(self, size=65536, dtype=numpy.float64, channels=None, name=None):
+        if shared_memory is None:
+            raise IOError('Shared memory needs Python 3.8 or newer.')
+        self.owner = name is None
+        if self.owner:
+            dtype = numpy.dtype(dtype)
+            frame_size = dtype.itemsize * (channels or 1)
+            self.shm = shared_memory.SharedMemory(create=True, size=self.header_size + int(size) * frame_size)
+            header = numpy.ndarray(3, dtype='<i8', buffer=self.shm.buf)
+            header[:] = (0, int(size), channels or 0)
+            self.shm.buf[24:self.header_size] = dtype.str.encode('ascii').ljust(self.header_size - 24)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            header = numpy.ndarray(3, dtype='<i8', buffer=self.shm.buf)
+            size, channels = int(header[1]), int(header[2]) or None
+            dtype = numpy.dtype(bytes(self.shm.buf[24:self.header_size]).decode('ascii').strip())
+        # Same attributes as RingBuffer, in the block
+        self.name = self.shm.name
+        self.size = int(size)
+        self.dtype = dtype
+        self.channels = channels
+        self._counter = header[:1]
+        self.data = numpy.ndarray(frames_shape(self.size, channels), dtype=dtype, buffer=self.shm.buf,
+                                  offset=self.header_size)
+
+    @property
+    def written(self):
+        """Total of samples written since creation, by any process."""
+        return int(self._counter[0])
+
+    @written.setter
+    def written(self, value):
+        self._counter[0] = value
+
+    def close(self):
+        """Detaches from the block, releasing it in the process that created it.
+
+        What was written is still readable here, from a copy.
+        """
+        if self.shm is None:
+            return
+        self.data = self.data.copy()
+        self._counter = self._counter.copy()
+        try:
+            self.shm.close()
+        except BufferError:
+            # Views given to readers still use it, it is unmapped when they are gone
+            pass
+        if self.owner:
+            self.shm.unlink()
+        self.shm = None
+
+
+class SlidingWindow():
+    """Keeps the newest samples as one contiguous array, for scrolling plots.
+
+    Each sample is written twice in a buffer with twice the window size, so
+    the window is always a contiguous view and adding samples costs just the
+    new samples, not the whole window.
+
+    Parameters:
+        size (int): number of samples in the window.
+        dtype (numpy.dtype): sample type. Default numpy.float64.
+        channels (int): number of channels. Default None, one dimensional samples.
+    """
+
+    def __init__(self, size, dtype=numpy.float64, channels=None):
+        self.size = max(int(size), 1)
+        self._data = numpy.zeros(frames_shape(2 * self.size, channels), dtype=dtype)
+        # Position of the oldest sample in the window
+        self._start = 0
+
+    def extend(self, samples):
+        """Adds samples to the window, dropping the oldest ones.
+
+        Parameters:
+            samples (numpy.ndarray): new samples.
+        """
+        samples = numpy.asarray(samples)[-self.size:]
+        while samples.shape[0]:
+            count = min(samples.shape[0], self.size - self._start)
+            self._data[self._start:self._start + count] = samples[:count]
+            self._data[self._start + self.size:self._start + self.size + count] = samples[:count]
+            self._start = (self._start + count) % self.size
+            samples = samples[count:]
+
+    def view(self):
+        """Returns the window, the oldest sample first, without copying."""
+        return self._data[self._start:self._start + self.size]
+
+
+BlockStats = collections.namedtuple('BlockStats', ['mean', 'min', 'max', 'rms'])
+
+
+class BlockReducer():
+    """Reduces a stream of samples to statistics of fixed size blocks.
+
+    Samples that do not fill a whole block are kept for the next call, so
+    blocks are the same whatever the size of the chunks given. Frames
+    shaped (frames, channels) give statistics for each channel.
+
+    Parameters:
+        block_size (int): number of samples in each block.
+        keep_full (bool): keeps the full rate samples of the reduced blocks,
+            see pop_full. Default False.
+    """
+
+    def __init__(self, block_size, keep_full=False):
+        self.block_size = max(int(block_size), 1)
+        self.keep_full = keep_full
+        self._pending = None
+        self._full = []
+
+    def process(self, samples):
+        """Reduces the samples and returns the statistics of each complete block.
+
+        Parameters:
+            samples (numpy.ndarray): new samples.
+
+        Returns:
+            BlockStats: mean, min, max and rms arrays, one value (or frame) per block.
+        """
+        samples = numpy.asarray(samples, dtype=numpy.float64)
+        if self._pending is not None and self._pending.shape[0]:
+            samples = numpy.concatenate((self._pending, samples))
+        blocks = samples.shape[0] // self.block_size
+        used = blocks * self.block_size
+        self._pending = samples[used:].copy()
+        block = samples[:used].reshape((blocks, self.block_size) + samples.shape[1:])
+        if self.keep_full and used:
+            self._full.append(samples[:used].copy())
+        return BlockStats(mean=block.mean(axis=1),
+                          min=block.min(axis=1),
+                          max=block.max(axis=1),
+                          rms=numpy.sqrt(numpy.einsum('ij...,ij...->i...', block, block) / self.block_size))
+
+    def pop_full(self):
+        """Returns the full rate samples kept since the last call."""
+        if not self._full:
+            return numpy.empty(0)
+        full = numpy.concatenate(self._full)
+        self._full = []
+        return full
+
+    def reset(self):
+        """Drops pending and kept samples."""
+        self._pending = None
+        self._full = []
+
+
+class Resampler():
+    """Streaming resampler to any rate, with an anti-aliasing low pass filter.
+
+    Large decimations first go through moving averages (a CIC filter of
+    the given order) keeping one sample in R, which costs a few operations
+    per input sample and leaves a rate of at least oversample times the
+    output one. A Kaiser windowed sinc, tabulated for a fixed number of
+    fractional positions and interpolated between them, then takes the
+    exact rational ratio, computed just at the output samples, so most of
+    the work scales with the output rate.
+
+    The filter state is kept between calls, so the output is the same
+    whatever the size of the chunks given, and the delay of the filters is
+    compensated: output sample n is the signal at n / rate_out seconds. It
+    comes out delay seconds (or one output period, if longer) after that,
+    so long intervals get shorter filters, letting a bit more aliasing
+    through than the given taps would.
+
+    Parameters:
+        rate_in (float): input sample rate, in Hz.
+        rate_out (float): output sample rate, in Hz, exact up to a ratio of
+            integers below 1000 (e.g. 1 / 0.003 is 1000 / 3).
+        taps (int): longest filter, in periods of the lower rate. Default 16.
+        delay (float): longest delay of the output, in seconds. Default 0.1.
+        cutoff (float): pass band, as a fraction of the lower Nyquist frequency. Default 0.9.
+        oversample (int): lowest ratio between the rate after the moving averages and the output. Default 8.
+        order (int): number of moving averages. Default 3.
+        phases (int): fractional positions tabulated. Default 256.
+    """
+
+    def __init__(self, rate_in, rate_out, taps=16, delay=0.1, cutoff=0.9, oversample=8, order=3, phases=256):
+        rate_in = fractions.Fraction(rate_in).limit_denominator(1000)
+        rate_out = fractions.Fraction(rate_out).limit_denominator(1000)
+        self.rate_in = rate_in
+        self.rate_out = rate_out
+        self.factor = max(int(rate_in / (rate_out * oversample)), 1)
+        self.order = order if self.factor > 1 else 0
+        # Positions count in 1 / up of a sample after the moving averages,
+        # each output moves down of them
+        ratio = rate_out * self.factor / rate_in
+        self.up, self.down = ratio.numerator, ratio.denominator
+
+        rate = float(rate_in) / self.factor
+        lower = min(rate, float(rate_out))
+        averaged = self.order * (self.factor - 1) / 2. / self.factor
+        # Half the filter, in samples after the moving averages
+        half = min(taps / 2. / lower, max(delay, 1. / float(rate_out)) - averaged / rate) * rate
+        self.length = max(int(math.ceil(2 * half)), 2)
+        edge = cutoff * 0.5 * lower / rate
+        # Row j holds the taps for an output j / phases of a sample after the newest one
+        offsets = numpy.arange(phases + 1)[:, numpy.newaxis] / float(phases) + numpy.arange(self.length)
+        middle = self.length / 2.
+        # Short filters get a narrower main lobe, trading side lobes for it
+        beta = min(6., 2. * self.length * lower / rate)
+        window = numpy.i0(beta * numpy.sqrt(numpy.clip(1 - ((offsets - middle) / middle) ** 2, 0, 1))) / numpy.i0(beta)
+        table = numpy.sinc(2 * edge * (offsets - middle)) * window
+        self.table = table / table.sum(axis=1)[:, numpy.newaxis]
+        self.phases = phases
+
+        self._first = int(round((self.length - 1 + middle + averaged) * self.up))
+        self.reset()
+
+    def reset(self):
+        """Forgets the previous samples, the next ones start a new signal."""
+        self._tails = None
+        self._history = None
+        # Next kept sample of the moving averages, and next output position
+        self._phase = 0
+        self._next = self._first
+
+    def process(self, samples):
+        """Resamples the samples and returns the output samples now complete.
+
+        Parameters:
+            samples (numpy.ndarray): new samples, shaped (frames,) or (frames, channels).
+        """
+        samples = numpy.asarray(samples, dtype=numpy.float64)
+        if self._history is None:
+            frame = samples.shape[1:]
+            self._tails = [numpy.zeros((self.factor - 1,) + frame) for _ in range(self.order)]
+            self._history = numpy.zeros((self.length - 1,) + frame)
+
+        # Moving averages, carrying the last samples of each one
+        for stage in range(self.order):
+            data = numpy.concatenate((self._tails[stage], samples))
+            sums = numpy.cumsum(data, axis=0)
+            samples = numpy.concatenate((sums[self.factor - 1:self.factor], sums[self.factor:] - sums[:-self.factor]))
+            samples /= self.factor
+            self._tails[stage] = data[data.shape[0] - self.factor + 1:]
+        if self.factor > 1:
+            kept = samples[self._phase::self.factor]
+            self._phase = (self._phase - samples.shape[0]) % self.factor
+            samples = kept
+
+        # Windowed sinc just at the output samples, between two tabulated phases
+        data = numpy.concatenate((self._history, samples))
+        count = max((data.shape[0] * self.up - 1 - self._next) // self.down + 1, 0)
+        positions = self._next + numpy.arange(count, dtype=numpy.int64) * self.down
+        inputs = positions // self.up
+        fraction = (positions % self.up) * self.phases
+        row = fraction // self.up
+        weight = ((fraction % self.up) / float(self.up))[:, numpy.newaxis]
+        taps = self.table[row] * (1 - weight) + self.table[row + 1] * weight
+        windows = data[inputs[:, numpy.newaxis] - numpy.arange(self.length)]
+        output = numpy.einsum('nk,nk...->n...', taps, windows)
+
+        self._next += count * self.down - samples.shape[0] * self.up
+        self._history = data[samples.shape[0]:]
+        return output
+
+
+class SampleStore():
+    """Growable array of samples with constant append cost.
+
+    The capacity doubles when it is full, so on average each sample is
+    copied a constant number of times whatever the recording length.
+
+    With a memory budget, once the capacity would take more than that the
+    samples spill to a numpy.memmap file in the folder given: they are
+    copied there once and the file grows in place from then on. Reading is
+    the same whether the samples are in memory or on disk.
+
+    Parameters:
+        capacity (int): initial capacity, in samples. Default 1024.
+        dtype (numpy.dtype): sample type. Default numpy.float64.
+        channels (int): number of channels. Default None, one dimensional samples.
+        memory_budget (int): most bytes kept in memory. Default None, no limit.
+        folder (str): folder of the spill file. Default None, the temporary folder.
+    """
+
+    def __init__(self, capacity=1024, dtype=numpy.float64, channels=None, memory_budget=None, folder=None):
+        self.channels = channels
+        self.memory_budget = memory_budget
+        self.folder = folder
+        # Path of the memmap file, once spilled
+        self.spill_path = None
+        self._data = numpy.empty(frames_shape(max(int(capacity), 1), channels), dtype=dtype)
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, index):
+        # Slices are views of the stored samples
+        return self._data[:self._size][index]
+
+    def append(self, samples):
+        """Appends samples to the store.
+
+        Parameters:
+            samples (numpy.ndarray): new samples.
+        """
+        samples = numpy.asarray(samples)
+        size = self._size + samples.shape[0]
+        if size > self._data.shape[0]:
+            capacity = max(2 * self._data.shape[0], size)
+            if self.spill_path is not None or (self.memory_budget is not None and
+                                               capacity * self._data[:1].nbytes > self.memory_budget):
+                self._spill(capacity)
+            else:
+                data = numpy.empty(frames_shape(capacity, self.channels), dtype=self._data.dtype)
+                data[:self._size] = self._data[:self._size]
+                self._data = data
+        self._data[self._size:size] = samples
+        self._size = size
+
+    def _spill(self, capacity):
+        shape = frames_shape(capacity, self.channels)
+        if self.spill_path is None:
+            handle, self.spill_path = tempfile.mkstemp(prefix='wavy_spill_', suffix='.dat', dir=self.folder)
+            os.close(handle)
+            logging.info('Recording spilled to %s', self.spill_path)
+            data = numpy.memmap(self.spill_path, dtype=self._data.dtype, mode='w+', shape=shape)
+            data[:self._size] = self._data[:self._size]
+        else:
+            # The file grows in place, what is on disk is not copied again.
+            # The old map is released first and numpy.memmap extends the file
+            # by writing past its end, as Windows cannot truncate a mapped file.
+            dtype = self._data.dtype
+            self._data.flush()
+            self._data = None
+            data = numpy.memmap(self.spill_path, dtype=dtype, mode='r+', shape=shape)
+        self._data = data
+
+    def clear(self):
+        """Removes all samples, keeping the capacity."""
+        self._size = 0
+
+    def close(self):
+        """Removes all samples and the spill file, if any."""
+        self._size = 0
+        if self.spill_path is not None:
+            self._data = numpy.empty(frames_shape(1, self.channels), dtype=self._data.dtype)
+            try:
+                os.remove(self.spill_path)
+            except OSError as err:
+                # Views of the samples may keep the file open (e.g. on Windows)
+                logging.warning('Problem removing %s: %s', self.spill_path, str(err))
+            self.spill_path = None
+
+    def to_numpy(self):
+        """Returns all samples as one contiguous array (a view, valid until the next append)."""
+        return self._data[:self._size]
+
+
+class UniformSeries():
+    """Samples taken at a uniform time base.
+
+    The time of sample i is ``t0 + i * dt``; it is computed only for the
+    samples asked for, so no time array is kept and timestamps do not
+    accumulate rounding errors.
+
+    Parameters:
+        dt (float): sample interval, in seconds.
+        t0 (float): time of the first sample, in seconds. Default 0.
+        samples (SampleStore): samples. Default None, an empty store.
+    """
+
+    def __init__(self, dt, t0=0., samples=None):
+        self.dt = float(dt)
+        self.t0 = float(t0)
+        self.samples = SampleStore() if samples is None else samples
+
+    def __len__(self):
+        return len(self.samples)
+
+    def __getitem__(self, index):
+        return self.samples[index]
+
+    @property
+    def rate(self):
+        """Sample rate, in Hz."""
+        return 1. / self.dt
+
+    def append(self, samples):
+        """Appends samples to the series.
+
+        Parameters:
+            samples (numpy.ndarray): new samples.
+        """
+        self.samples.append(samples)
+
+    def duration(self):
+        """Returns the time covered by the samples, in seconds."""
+        return len(self.samples) * self.dt
+
+    def time(self, start=0, stop=None):
+        """Returns the time of the samples in a range of indexes.
+
+        Parameters:
+            start (int): first index. Default 0.
+            stop (int): index after the last one. Default None, the end.
+        """
+        stop = len(self.samples) if stop is None else min(stop, len(self.samples))
+        return self.t0 + numpy.arange(start, max(stop, start)) * self.dt
+
+    def index(self, time):
+        """Returns the index of the sample at (or just before) a time, inside the series.
+
+        Parameters:
+            time (float): time, in seconds.
+        """
+        return int(min(max(numpy.floor((time - self.t0) / self.dt), 0), len(self.samples)))
+
+    def to_numpy(self):
+        """Returns all samples as one contiguous array."""
+        return self.samples.to_numpy()
+
+    def save_csv(self, filepath, header=None, block_size=65536):
+        """Saves time and amplitude columns (one per channel) to a csv file, block by block.
+
+        Parameters:
+            filepath (str): path of the csv file.
+            header (str): first line of the file. Default None, see csv_header.
+            block_size (int): number of lines formatted at once. Default 65536.
+        """
+        if header is None:
+            header = csv_header(self.samples[:0].shape[1] if self.samples[:0].ndim > 1 else None)
+        with open(filepath, 'w') as csv_file:
+            csv_file.write(header + '\n')
+            for start in range(0, len(self.samples), block_size):
+                stop = start + block_size
+                numpy.savetxt(csv_file, numpy.column_stack((self.time(start, stop), self.samples[start:stop])),
+                              fmt='%.10g', delimiter=',')
+
+
+class MinMaxPyramid():
+    """Min and max of a growing sample store at several resolutions.
+
+    Level k keeps the min and max of each block of ``factor ** k`` samples
+    and is updated just for the new samples, so a plot can show any range
+    with a couple of points per pixel without scanning the raw samples.
+    Frames shaped (frames, channels) are summarized for each channel.
+
+    Parameters:
+        samples (SampleStore): samples to index.
+        factor (int): blocks of a level summarized by each block of the next one. Default 8.
+    """
+
+    def __init__(self, samples, factor=8):
+        self.samples = samples
+        self.factor = int(factor)
+        # Shape of each sample, () or (channels,)
+        self._frame = samples[:0].shape[1:]
+        # (min, max) stores of each level, the first one has blocks of factor samples
+        self.levels = []
+
+    def update(self):
+        """Summarizes the samples appended since the last update."""
+        below_min = below_max = self.samples
+        level = 0
+        while True:
+            available = len(below_min) // self.factor
+            if level == len(self.levels):
+                if not available:
+                    break
+                channels = self._frame[0] if self._frame else None
+                # Each level spills within the budget and to the folder of the samples
+                self.levels.append(tuple(SampleStore(dtype=self.samples[:0].dtype, channels=channels,
+                                                     memory_budget=self.samples.memory_budget,
+                                                     folder=self.samples.folder) for _ in range(2)))
+            mins, maxs = self.levels[level]
+            done = len(mins)
+            if available > done:
+                block = slice(done * self.factor, available * self.factor)
+                mins.append(below_min[block].reshape((-1, self.factor) + self._frame).min(axis=1))
+                maxs.append(below_max[block].reshape((-1, self.factor) + self._frame).max(axis=1))
+            below_min, below_max = mins, maxs
+            level += 1
+
+    def decimate(self, start, stop, points):
+        """Returns the samples of a range reduced to about the given number of points.
+
+        Uses the coarsest level that still gives at least ``points`` blocks in
+        the range, each block drawn as its min and max.
+
+        Parameters:
+            start (int): first sample index.
+            stop (int): index after the last sample.
+            points (int): number of points wanted, e.g. the plot width in pixels.
+
+        Returns:
+            tuple: (indexes, values), the sample index of each value and the values.
+        """
+        start = max(int(start), 0)
+        stop = min(int(stop), len(self.samples))
+        level = 0
+        size = 1
+        while level < len(self.levels) and (stop - start) // (size * self.factor) >= max(points, 1):
+            level += 1
+            size *= self.factor
+        if level == 0:
+            return numpy.arange(start, max(stop, start)), self.samples[start:stop]
+
+        mins, maxs = self.levels[level - 1]
+        first = start // size
+        last = max(min(stop // size, len(mins)), first)
+        values = numpy.empty((2 * (last - first) + 2,) + self._frame, dtype=mins[:0].dtype)
+        values[0:-2:2] = mins[first:last]
+        values[1:-2:2] = maxs[first:last]
+        indexes = numpy.repeat(numpy.arange(first, last + 1) * size, 2)
+        # Samples after the last complete block are summarized on the fly
+        tail = self.samples[last * size:stop]
+        if tail.shape[0]:
+            values[-2] = tail.min(axis=0)
+            values[-1] = tail.max(axis=0)
+            return indexes, values
+        return indexes[:-2], values[:-2]
+
+    def close(self):
+        """Removes the levels and their spill files, if any."""
+        for mins, maxs in self.levels:
+            mins.close()
+            maxs.close()
+        self.levels = []
+
+
+class Trigger():
+    """Detects threshold crossings in a stream of samples.
+
+    The detector follows the level of one channel, its slope (in volts per
+    second) or its rms over a short window. Each block is checked at once
+    with numpy, and what the detector needs from the previous block is kept,
+    so a crossing between two blocks is found as well.
+
+    Parameters:
+        threshold (float): value crossed, in the units of the detector.
+        mode (str): 'level', 'slope' or 'rms'. Default 'level'.
+        edge (str): 'rising' or 'falling'. Default 'rising'.
+        rate (float): sample rate in Hz, for slope and rms. Default 1.
+        channel (int): channel watched, when samples are frames. Default 0.
+        rms_time (float): rms window, in seconds. Default 0.01.
+    """
+
+    modes = ['level', 'slope', 'rms']
+    edges = ['rising', 'falling']
+
+    def __init__(self, threshold, mode='level', edge='rising', rate=1., channel=0, rms_time=0.01):
+        if mode not in self.modes:
+            raise ValueError('Unknown trigger mode: {}'.format(mode))
+        if edge not in self.edges:
+            raise ValueError('Unknown trigger edge: {}'.format(edge))
+        self.threshold = float(threshold)
+        self.mode = mode
+        self.edge = edge
+        self.rate = float(rate)
+        self.channel = channel
+        self.window = max(int(round(rms_time * self.rate)), 1)
+        self.reset()
+
+    def reset(self):
+        """Forgets the previous samples, e.g. after a pause."""
+        # Samples the detector needs from the previous block
+        self._tail = numpy.empty(0)
+        # Last detector value, to find a crossing at the start of a block
+        self._last = None
+
+    def values(self, samples):
+        """Returns the detector value of each sample (or frame).
+
+        Parameters:
+            samples (numpy.ndarray): new samples.
+        """
+        samples = numpy.asarray(samples, dtype=numpy.float64)
+        if samples.ndim > 1:
+            samples = samples[:, self.channel]
+        if self.mode == 'level' or not samples.shape[0]:
+            return samples
+        data = numpy.concatenate((self._tail, samples))
+        if self.mode == 'slope':
+            # The first sample ever has no slope
+            previous = data[:-1] if self._tail.shape[0] else numpy.concatenate((samples[:1], samples[:-1]))
+            self._tail = samples[-1:].copy()
+            return (data[-samples.shape[0]:] - previous) * self.rate
+
+        # Moving rms, from the cumulative sum of squares of the window and the block
+        squares = numpy.concatenate(([0.], numpy.cumsum(data * data)))
+        ends = numpy.arange(self._tail.shape[0], data.shape[0]) + 1
+        starts = numpy.maximum(ends - self.window, 0)
+        self._tail = data[max(data.shape[0] - self.window + 1, 0):].copy() if self.window > 1 else data[:0]
+        return numpy.sqrt(numpy.maximum(squares[ends] - squares[starts], 0.) / (ends - starts))
+
+    def active(self, values):
+        """Returns where the detector values are past the threshold, for the edge."""
+        if self.edge == 'rising':
+            return values >= self.threshold
+        return values <= self.threshold
+
+    def crossings(self, values):
+        """Returns where the detector values cross the threshold, for the edge.
+
+        Parameters:
+            values (numpy.ndarray): detector values, see values.
+
+        Returns:
+            numpy.ndarray: True for each value past the threshold whose previous one was not.
+        """
+        active = self.active(values)
+        if not active.shape[0]:
+            return active
+        # Already past the threshold when the stream starts is not a crossing
+        last = active[0] if self._last is None else self._last
+        crossed = active.copy()
+        crossed[0] &= not last
+        crossed[1:] &= ~active[:-1]
+        self._last = active[-1]
+        return crossed
+
+
+TriggerEvent = collections.namedtuple('TriggerEvent', ['kind', 'samples', 'frame'])
+
+
+class TriggerGate():
+    """Cuts a stream of samples in runs started by a trigger.
+
+    While waiting, the newest samples are kept in a ring buffer, so each
+    run starts with the pre-trigger time before the crossing. A run lasts
+    the post-trigger time or, without one, until the detector stays back
+    past the threshold for the hold time. Several runs may start and stop
+    in one block.
+
+    The events returned have a kind, 'start' (with the pre-trigger samples),
+    'data' (with the samples of the run) or 'stop' (with none), and the
+    frame number of their first sample counted since the gate was created.
+    Their samples are views of the block given, so write them right away.
+
+    Parameters:
+        trigger (Trigger): detector of the start of each run.
+        rate (float): sample rate, in Hz.
+        pre_time (float): time kept before the crossing, in seconds. Default 0.5.
+        post_time (float): length of each run after the crossing, in seconds. Default 0, see hold_time.
+        hold_time (float): time back past the threshold that stops a run, in seconds. Default 1.
+    """
+
+    def __init__(self, trigger, rate, pre_time=0.5, post_time=0., hold_time=1.):
+        self.trigger = trigger
+        self.pre_frames = int(round(pre_time * rate))
+        self.post_frames = int(round(post_time * rate))
+        self.hold_frames = max(int(round(hold_time * rate)), 1)
+        self._history = None
+        self.recording = False
+        # Frames left in the run, or frames in a row back past the threshold
+        self._left = 0
+        self._quiet = 0
+        # Runs started and frames given since creation
+        self.runs = 0
+        self.frames = 0
+
+    def process(self, samples):
+        """Checks the samples of a block, see the class for the events returned.
+
+        Parameters:
+            samples (numpy.ndarray): new samples.
+
+        Returns:
+            list: TriggerEvent of the runs in the block, in order.
+        """
+        samples = numpy.asarray(samples)
+        if self._history is None:
+            channels = samples.shape[1] if samples.ndim > 1 else None
+            self._history = RingBuffer(max(self.pre_frames, 1), samples.dtype, channels)
+        values = self.trigger.values(samples)
+        crossed = self.trigger.crossings(values)
+        active = self.trigger.active(values)
+        events = []
+        position = 0
+        size = samples.shape[0]
+        while position < size:
+            if not self.recording:
+                hits = numpy.flatnonzero(crossed[position:])
+                if not hits.shape[0]:
+                    self._history.write(samples[position:])
+                    break
+                start = position + int(hits[0])
+                self._history.write(samples[position:start])
+                pre = self._history.latest(min(self.pre_frames, self._history.written))
+                # The next run has its own pre-trigger
+                self._history = RingBuffer(self._history.size, samples.dtype, self._history.channels)
+                events.append(TriggerEvent('start', pre, self.frames + start - pre.shape[0]))
+                self.recording = True
+                self.runs += 1
+                self._left = self.post_frames
+                self._quiet = 0
+                position = start
+                continue
+
+            if self.post_frames:
+                stop = min(position + self._left, size)
+                self._left -= stop - position
+                done = self._left == 0
+            else:
+                # Frames in a row back past the threshold, carried from the previous block
+                indexes = numpy.arange(position, size)
+                last_active = numpy.where(active[position:], indexes, position - 1 - self._quiet)
+                quiet = indexes - numpy.maximum.accumulate(last_active)
+                held = numpy.flatnonzero(quiet >= self.hold_frames)
+                done = held.shape[0] > 0
+                stop = position + int(held[0]) + 1 if done else size
+                self._quiet = 0 if done else int(quiet[-1])
+            events.append(TriggerEvent('data', samples[position:stop], self.frames + position))
+            position = stop
+            if done:
+                events.append(TriggerEvent('stop', samples[:0], self.frames + stop))
+                self.recording = False
+        self.frames += size
+        return events
+
+
+class SyntheticSource(Source):
+    """Generates a damped oscillation with noise, for tests without input devices.
+
+    The signal is ``offset + amplitude * exp(-damping * t) * sin(2 pi frequency t)``
+    plus gaussian noise, the same in every channel but the noise.
+
+    Parameters:
+        interval (float): time (in seconds) read at each call. Default 0.02 seconds.
+        rate (int): sample rate, in Hz. Default 44100 Hz.
+        channels (int): number of channels. Default 1.
+        frequency (float): oscillation frequency, in Hz. Default 5 Hz.
+        amplitude (float): oscillation amplitude, in volts. Default 1 V.
+        noise (float): standard deviation of the noise, in volts. Default 0 V.
+        damping (float): damping rate, in 1/s. Default 0, no damping.
+        offset (float): constant added to the signal, in volts. Default 0 V.
+        realtime (bool): delivers data at the sample rate, otherwise as fast as possible. Default True.
+    """
+
+    def __init__(self, interval=0.02, rate=44100, channels=1, frequency=5., amplitude=1., noise=0.,
+                 damping=0., offset=0., realtime=True):
+        super(SyntheticSource, self).__init__(interval, rate, channels)
+        self.frequency = frequency
+        self.amplitude = amplitude
+        self.noise = noise
+        self.damping = damping
+        self.offset = offset
+        self.realtime = realtime
+        self.frames = 0
+        self._start = None
+
+    def open(self):
+        self.frames = 0
+        self._start = time.perf_counter()
+
+    def reconfigure(self, interval=None, rate=None):
+        # The signal and its pace go on from the same time at the new rate
+        elapsed = self.frames / float(self.rate)
+        super(SyntheticSource, self).reconfigure(interval, rate)
+        self.frames = int(round(elapsed * self.rate))
+        if self._start is not None:
+            self._start += self.frames / float(self.rate) - elapsed
+
+    def read(self):
+        t = numpy.arange(self.frames, self.frames + self.chunk) / float(self.rate)
+        self.frames += self.chunk
+        oscillation = numpy.exp(-self.damping * t) * numpy.sin(2 * numpy.pi * self.frequency * t)
+        data_array = numpy.repeat((self.offset + self.amplitude * oscillation)[:, numpy.newaxis], self.channels,
+                                  axis=1)
+        if self.noise:
+            data_array += numpy.random.normal(0., self.noise, data_array.shape)
+
+        # Waits until the chunk would be available from an input device
+        if self.realtime:
+            delay = self._start + self.frames / float(self.rate) - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+        return data_array
+
+
+def read_wave(filepath):
+    """Reads a PCM or float WAVE file, RIFF or RF64, scaled to volts.
+
+    Parameters:
+        filepath (str): path of the wav file.
+
+    Returns:
+        tuple: sample rate, in Hz, and samples shaped (frames, channels).
+    """
+    with open(filepath, 'rb') as wav_file:
+        riff, _, wave_id = struct.unpack('<4sI4s', wav_file.read(12))
+        if riff not in (b'RIFF', b'RF64') or wave_id != b'WAVE':
+            raise ValueError('Not a WAVE file: {}'.format(filepath))
+        fmt = None
+        data = None
+        # Size of the data in the ds64 chunk of RF64 files
+        data_size = None
+        while data is None:
+            header = wav_file.read(8)
+            if len(header) < 8:
+                raise ValueError('No data in the WAVE file: {}'.format(filepath))
+            chunk, size = struct.unpack('<4sI', header)
+            if chunk == b'data':
+                data = wav_file.read(data_size if size == 0xFFFFFFFF and data_size is not None else size)
+                continue
+            body = wav_file.read(size + size % 2)
+            if chunk == b'ds64':
+                data_size = struct.unpack('<Q', body[8:16])[0]
+            elif chunk == b'fmt ':
+                fmt = struct.unpack('<HHIIHH', body[:16])
+                if fmt[0] == 0xFFFE:
+                    # Extensible format, the actual one starts the sub format
+                    fmt = struct.unpack('<H', body[24:26]) + fmt[1:]
+    if fmt is None:
+        raise ValueError('No format in the WAVE file: {}'.format(filepath))
+
+    tag, channels, rate, _, _, bits = fmt
+    if tag == 1 and bits == 8:
+        # 8 bits WAVE files are unsigned
+        samples = (numpy.frombuffer(data, dtype=numpy.uint8) - 128.0) * (FULL_SCALE / 128.0)
+    else:
+        sample_format = {(1, 16): 'int16', (1, 24): 'int24', (1, 32): 'int32', (3, 32): 'float32'}.get((tag, bits))
+        if sample_format is None:
+            raise ValueError('Unsupported WAVE format {} with {} bits: {}'.format(tag, bits, filepath))
+        width = SampleDecoder.formats[sample_format][0]
+        samples = SampleDecoder(sample_format, len(data) // width).decode(data)
+    return rate, samples.reshape(-1, channels)
+
+
+class FileSource(Source):
+    """Replays a recorded WAVE or numpy (.npy) file.
+
+    WAVE files are scaled to volts like the input device; npy files are
+    expected in volts, shaped (frames,) or (frames, channels).
+
+    Parameters:
+        filepath (str): path of the wav or npy file.
+        interval (float): time (in seconds) read at each call. Default 0.02 seconds.
+        rate (int): sample rate of npy files, in Hz, wav files have their own. Default None.
+        realtime (bool): delivers data at the sample rate, otherwise as fast as possible. Default True.
+        loop (bool): starts again at the end of the file instead of stopping. Default False.
+    """
+
+    def __init__(self, filepath, interval=0.02, rate=None, realtime=True, loop=False):
+        super(FileSource, self).__init__(interval, rate or 22050, 1)
+        self.filepath = filepath
+        self.requested_rate = rate
+        self.realtime = realtime
+        self.loop = loop
+        self.frames = 0
+        self._data = None
+        self._start = None
+
+    def open(self):
+        if os.path.splitext(self.filepath)[1].lower() == '.npy':
+            if not self.requested_rate:
+                raise ValueError('The sample rate is needed to replay npy files.')
+            data = numpy.load(self.filepath, mmap_mode='r')
+            self.rate = int(self.requested_rate)
+            self.channels = 1 if data.ndim == 1 else data.shape[1]
+            self._data = data.reshape(-1, self.channels)
+        else:
+            self.rate, self._data = read_wave(self.filepath)
+            self.channels = self._data.shape[1]
+        self.chunk = max(int(self.interval * self.rate), 1)
+        self.frames = 0
+        self._start = time.perf_counter()
+
+    def reconfigure(self, interval=None, rate=None):
+        # The sample rate is the one of the file
+        super(FileSource, self).reconfigure(interval)
+
+    def read(self):
+        total = self._data.shape[0]
+        if self.frames >= total:
+            if not self.loop or not total:
+                raise EOFError('End of {}'.format(self.filepath))
+            self.frames = 0
+            self._start = time.perf_counter()
+
+        stop = min(self.frames + self.chunk, total)
+        data_array = numpy.array(self._data[self.frames:stop], dtype=numpy.float64)
+        played = stop - self.frames
+        self.frames = stop
+
+        # Waits until the chunk would be available from an input device
+        if self.realtime:
+            delay = self._start + self.frames / float(self.rate) - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            # Keeps the pace when the file starts again
+            if self.loop and self.frames >= total:
+                self._start += played / float(self.rate)
+
+        return data_array
+
+
+# Frames missing in a capture: sequence number where they are missing, how many and why
+Gap = collections.namedtuple('Gap', ['frame', 'lost', 'reason'])
+
+
+def save_gaps(filepath, gaps, rate):
+    """Saves gaps to a csv file, next to the data they refer to.
+
+    Parameters:
+        filepath (str): path of the csv file.
+        gaps (list): Gap of the data, frames counted from its beginning.
+        rate (float): sample rate of the frames, in Hz.
+    """
+    with open(filepath, 'w') as csv_file:
+        csv_file.write('time,frame,lost,reason\n')
+        for gap in gaps:
+            csv_file.write('{:.10g},{},{},{}\n'.format(gap.frame / float(rate), gap.frame, gap.lost, gap.reason))
+
+
+class AudioCapture():
+    """Reads a source on its own thread and keeps the data in a ring buffer.
+
+    The blocking read (e.g. ``stream.read`` of the input device) happens on
+    the capture thread, so whoever consumes the data (e.g. the plots on the
+    GUI thread) just looks at the ring buffer and never waits for it.
+
+    Each chunk is timestamped when it arrives, so the clock of the source
+    (when its first frame happened and its actual rate) can be measured,
+    see clock.
+
+    Lost data is detected and kept in gaps, with counters by reason: chunks
+    that could not be read ('overflow' when the input device reports it,
+    'error' otherwise) and, for real time sources, frames that never came
+    ('timing'), when the frames read fall behind the monotonic clock by
+    more than a chunk for confirm_time. A late read (e.g. the thread was
+    not scheduled) is not a gap, the next chunks just come sooner.
+
+    Parameters:
+        source (Source): acquisition source, opened by start.
+        buffer_time (float): time (in seconds) kept in the ring buffer. Default 10 seconds.
+        stamps (int): number of chunk timestamps kept to measure the clock. Default 1000.
+        confirm_time (float): time (in seconds) behind the clock before it is a gap. Default 0.5 seconds.
+    """
+
+    def __init__(self, source, buffer_time=10., stamps=1000, confirm_time=0.5):
+        self.source = source
+        self.buffer_time = buffer_time
+        self.confirm_time = confirm_time
+        self.ring = None
+        self._running = threading.Event()
+        self._thread = None
+        # (frames written, time.perf_counter) after each chunk
+        self._stamps = collections.deque(maxlen=stamps)
+        self._stamps_lock = threading.Lock()
+        # Gap found and how many of each reason, plus the frames lost
+        self.gaps = []
+        self.counters = collections.Counter()
+        # Called on the capture thread after each chunk and at the end, e.g. to wake a consumer
+        self.notify = None
+        # Frames behind the clock when nothing is lost, it follows the drift
+        self._baseline = None
+        # (frames written, time, least frames behind) since falling behind
+        self._late = None
+        self._started = None
+
+    def start(self):
+        """Opens the source and starts the capture thread."""
+        if self._thread is not None:
+            return
+        self.source.open()
+        self.ring = RingBuffer(max(int(self.buffer_time * self.source.rate), self.source.chunk),
+                               channels=self.source.channels)
+        self._start_thread()
+
+    def reconfigure(self, interval=None, rate=None):
+        """Changes the time read at each call and/or the sample rate, keeping the source open.
+
+        The capture thread stops between two reads and starts again after the
+        source is reconfigured (if that fails, the capture stays stopped). The
+        ring buffer (and its readers) is kept, so what was already captured is
+        not lost.
+
+        Parameters:
+            interval (float): time (in seconds) read at each call. Default None, unchanged.
+            rate (int): sample rate, in Hz. Default None, unchanged.
+        """
+        self._stop_thread()
+        self.source.reconfigure(interval, rate)
+        # The clock starts again with the new rate
+        with self._stamps_lock:
+            self._stamps.clear()
+        self._start_thread()
+
+    def _start_thread(self):
+        # The clock starts with what was already written, at the current rate
+        self._started = time.perf_counter() - self.ring.written / float(self.source.rate)
+        self._baseline = None
+        self._late = None
+        self._running.set()
+        self._thread = threading.Thread(target=self._run, name='AudioCapture')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _stop_thread(self):
+        self._running.clear()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def is_running(self):
+        """Returns whether the source is still being read, False after its end."""
+        return self._running.is_set()
+
+    def _run(self):
+        while self._running.is_set():
+            try:
+                data_array = self.source.read()
+            except EOFError:
+                logging.info('The source has no more data.')
+                self._running.clear()
+                break
+            except IOError as err:
+                logging.warning('Problem reading audio data: %s', str(err))
+                overflow = getattr(err, 'errno', None) == getattr(pyaudio, 'paInputOverflowed', -9981)
+                self._mark_gap(self.ring.written, self.source.chunk, 'overflow' if overflow else 'error')
+                continue
+            written = self.ring.written
+            self.ring.write(data_array)
+            now = time.perf_counter()
+            with self._stamps_lock:
+                self._stamps.append((self.ring.written, now))
+            if self.source.realtime:
+                self._check_timing(written, now)
+            if self.notify is not None:
+                self.notify()
+        if self.notify is not None:
+            self.notify()
+
+    def _mark_gap(self, frame, lost, reason):
+        logging.warning('Capture gap (%s), about %d frames lost at frame %d.', reason, lost, frame)
+        self.gaps.append(Gap(frame, lost, reason))
+        self.counters[reason] += 1
+        self.counters['lost'] += lost
+        # The clock is measured again after the gap
+        self._baseline = None
+        self._late = None
+
+    def _check_timing(self, written, now):
+        # Frames behind the clock stay up after a loss, a late read just
+        # gets the next chunks sooner and comes back
+        behind = (now - self._started) * self.source.rate - self.ring.written
+        if self._baseline is None:
+            self._baseline = behind
+        elif self._late is None:
+            if behind - self._baseline > self.source.chunk:
+                self._late = (written, now, behind)
+            else:
+                # Follows the drift slowly, the jitter barely moves it
+                self._baseline = min(behind, self._baseline + 0.1 * (behind - self._baseline))
+        else:
+            frame, since, least = self._late
+            least = min(least, behind)
+            if least - self._baseline <= self.source.chunk:
+                self._late = None
+            elif now - since >= self.confirm_time:
+                baseline = self._baseline
+                self._mark_gap(frame, int(least - baseline), 'timing')
+                self._baseline = least
+            else:
+                self._late = (frame, since, least)
+
+    def clock(self):
+        """Measures the clock of the source from the chunk timestamps.
+
+        A line is fitted to the time each chunk arrived against the frames
+        written, so the jitter of single reads averages out and the drift
+        of the source against the computer clock shows in the rate.
+
+        Returns:
+            tuple: (start, rate), the time.perf_counter of the first frame
+            and the measured rate, in Hz; None before the first chunk.
+        """
+        with self._stamps_lock:
+            stamps = numpy.array(self._stamps, dtype=numpy.float64)
+        if not stamps.shape[0]:
+            return None
+        frames, times = stamps[:, 0], stamps[:, 1]
+        rate = float(self.source.rate)
+        spread = frames - frames.mean()
+        # Less than a second of stamps is not enough to measure the rate
+        if frames[-1] - frames[0] >= self.source.rate:
+            rate = 1. / (numpy.dot(spread, times - times.mean()) / numpy.dot(spread, spread))
+        return times.mean() - frames.mean() / rate, rate
+
+    def stop(self):
+        """Stops the capture thread and closes the source."""
+        self._stop_thread()
+        self.source.close()
+
+    def close(self):
+        """Stops the capture for good, the same as stop here, see ProcessCapture.close."""
+        self.stop()
+
+    def resume(self):
+        """Opens the source again after stop, going on in the same ring buffer.
+
+        Readers of the ring buffer just get the new data, and the time
+        stopped is not a gap: the clock is measured again from now.
+        """
+        if self._thread is not None:
+            return
+        self.source.open()
+        with self._stamps_lock:
+            self._stamps.clear()
+        self._start_thread()
+
+
+class _CaptureJournal():
+    """Journals a recording in the capture process, see ProcessCapture.start_journal."""
+
+    def __init__(self, ring, rate, path, dt, raw_path=None, duration=0., start=None):
+        self.reader = ring.reader(ring.written if start is None else start)
+        # Values one per sample interval, as the interface computes them
+        self.resampler = Resampler(rate, 1. / dt)
+        self.journal = Journal(path, dt, ring.channels)
+        self.raw_journal = Journal(raw_path, 1. / rate, ring.channels) if raw_path else None
+        # Frames and values in the duration, the values come out after the frames by the resampler delay
+        self.stop = int(round(duration * rate)) if duration else None
+        self.values_stop = int(round(duration / dt)) if duration else None
+
+    def update(self):
+        """Journals what was captured since the last call, returns False once the duration is journaled."""
+        for block in self.reader.read():
+            values = self.resampler.process(block)
+            if self.stop is not None:
+                values = values[:max(self.values_stop - self.journal.frames, 0)]
+                if self.raw_journal is not None:
+                    block = block[:max(self.stop - self.raw_journal.frames, 0)]
+            if self.raw_journal is not None:
+                self.raw_journal.write(block)
+            self.journal.write(values)
+        return self.stop is None or self.journal.frames < self.values_stop
+
+    def close(self):
+        """Journals what is left and closes the journals, keeping them on disk."""
+        self.update()
+        for journal in (self.journal, self.raw_journal):
+            if journal is not None:
+                journal.close()
+
+
+def _capture_process(source, confirm_time, connection):
+    """Runs an AudioCapture of the source for ProcessCapture, in the child process."""
+    # Ctrl+C reaches the whole process group, the parent decides when to stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        source.open()
+    except (IOError, ValueError) as err:
+        connection.send(('error', str(err)))
+        return
+    # The parent creates the ring buffer, as the source opened
+    connection.send(('opened', {'rate': source.rate, 'chunk': source.chunk, 'channels': source.channels,
+                                'device_index': getattr(source, 'device_index', None)}))
+    try:
+        ring = SharedRingBuffer(name=connection.recv())
+    except (EOFError, OSError):
+        source.close()
+        return
+    capture = AudioCapture(source, confirm_time=confirm_time)
+    capture.ring = ring
+    capture._start_thread()
+
+    def send(message):
+        # False once the parent process is gone
+        try:
+            connection.send(message)
+        except (EOFError, OSError):
+            return False
+        return True
+
+    sent = 0
+    journal = None
+    # Set once the parent process is gone (e.g. it crashed), a recording being journaled goes on
+    orphan = False
+    try:
+        while capture.is_running():
+            message = None
+            if orphan:
+                time.sleep(0.2)
+            else:
+                try:
+                    if connection.poll(0.2):
+                        message = connection.recv()
+                except (EOFError, OSError):
+                    orphan = True
+            if message == 'stop':
+                break
+            if message is not None and message[0] == 'journal':
+                if journal is not None:
+                    journal.close()
+                    journal = None
+                    orphan = not send(('journaled',))
+                if message[1] is not None:
+                    journal = _CaptureJournal(ring, source.rate, **message[1])
+            if journal is not None and not journal.update():
+                # The whole duration is journaled
+                journal.close()
+                journal = None
+                orphan = orphan or not send(('journaled',))
+            if not orphan:
+                # Gaps and clock go to the parent a few times per second
+                gaps = capture.gaps[sent:]
+                sent += len(gaps)
+                orphan = not send(('status', gaps, capture.clock()))
+            if orphan and journal is None:
+                break
+        if not orphan:
+            send(('status', capture.gaps[sent:], capture.clock()))
+    finally:
+        if journal is not None:
+            journal.close()
+        capture.stop()
+        ring.close()
+
+
+class ProcessCapture():
+    """Reads a source on its own process and keeps the data in a shared ring buffer.
+
+    Works like AudioCapture, whose capture thread runs in a child process
+    writing to a SharedRingBuffer, so garbage collection, plotting or disk
+    writes in this process never delay the input device. Gaps and the clock
+    of the source come through a pipe, and the capture process ends by
+    itself if this one is gone, unless it is journaling a recording (see
+    start_journal): then the recording goes on to its end.
+
+    The source is sent to the child process, so it must be picklable and
+    not open yet, as AudioRecord before start; its rate, chunk and channels
+    are updated here once it is opened there.
+
+    Parameters:
+        source (Source): acquisition source, opened by start in the child process.
+        buffer_time (float): time (in seconds) kept in the ring buffer. Default 10 seconds.
+        confirm_time (float): time (in seconds) behind the clock before it is a gap. Default 0.5 seconds.
+    """
+
+    def __init__(self, source, buffer_time=10., confirm_time=0.5):
+        self.source = source
+        self.buffer_time = buffer_time
+        self.confirm_time = confirm_time
+        self.ring = None
+        self._process = None
+        self._connection = None
+        self._gaps = []
+        self._counters = collections.Counter()
+        self._clock = None
+        self._journaling = False
+
+    @property
+    def gaps(self):
+        """Gaps found by the capture process, see AudioCapture."""
+        self._poll()
+        return self._gaps
+
+    @property
+    def counters(self):
+        """Gaps of each reason and frames lost, see AudioCapture."""
+        self._poll()
+        return self._counters
+
+    def _poll(self):
+        while self._connection is not None and self._connection.poll():
+            try:
+                status = self._connection.recv()
+            except (EOFError, OSError):
+                self._connection = None
+                break
+            if status[0] == 'journaled':
+                self._journaling = False
+                continue
+            for gap in status[1]:
+                self._gaps.append(gap)
+                self._counters[gap.reason] += 1
+                self._counters['lost'] += gap.lost
+            self._clock = status[2]
+
+    def _spawn(self):
+        context = multiprocessing.get_context('spawn')
+        self._connection, child = context.Pipe()
+        self._process = context.Process(target=_capture_process, name='AudioCapture',
+                                        args=(self.source, self.confirm_time, child))
+        self._process.daemon = True
+        self._process.start()
+        child.close()
+        try:
+            kind, opened = self._connection.recv()
+        except EOFError:
+            kind, opened = 'error', 'the capture process ended'
+        if kind == 'error':
+            self._process.join()
+            self._process = None
+            self._connection = None
+            raise IOError(opened)
+        for name, value in opened.items():
+            setattr(self.source, name, value)
+
+    def start(self):
+        """Starts the capture process, which opens the source."""
+        if self._process is not None:
+            return
+        self._spawn()
+        self.ring = SharedRingBuffer(max(int(self.buffer_time * self.source.rate), self.source.chunk),
+                                     channels=self.source.channels)
+        self._connection.send(self.ring.name)
+
+    def resume(self):
+        """Starts the capture process again after stop, going on in the same ring buffer."""
+        if self._process is not None:
+            return
+        self._spawn()
+        self._connection.send(self.ring.name)
+
+    def is_running(self):
+        """Returns whether the source is still being read, False after its end."""
+        return self._process is not None and self._process.is_alive()
+
+    def clock(self):
+        """Measures the clock of the source, see AudioCapture.clock.
+
+        The times are time.perf_counter of the capture process, which is
+        the same clock as here on most systems.
+        """
+        self._poll()
+        return self._clock
+
+    def start_journal(self, path, dt, raw_path=None, duration=0., start=None):
+        """Has the capture process journal a recording, so it goes on if this process crashes.
+
+        The values (one per sample interval, resampled like the interface
+        does) and optionally the full rate samples are journaled from the
+        start frame on, see Journal and read_journal. If this process is gone,
+        the capture process goes on until the duration is journaled (or the
+        source ends) and then ends.
+
+        Parameters:
+            path (str): path of the journal of the values.
+            dt (float): sample interval of the values, in seconds.
+            raw_path (str): path of the journal of the full rate samples. Default None, not journaled.
+            duration (float): time journaled, in seconds. Default 0, until stop_journal.
+            start (int): first frame journaled, of the ring buffer. Default None, from now on.
+        """
+        self._connection.send(('journal', {'path': path, 'dt': dt, 'raw_path': raw_path,
+                                           'duration': duration, 'start': start}))
+        self._journaling = True
+
+    def stop_journal(self, timeout=5.):
+        """Stops journaling, returning once the journals are closed (they are kept on disk).
+
+        Parameters:
+            timeout (float): longest wait, in seconds. Default 5 seconds.
+        """
+        self._poll()
+        if not self._journaling or self._connection is None:
+            return
+        self._connection.send(('journal', None))
+        deadline = time.perf_counter() + timeout
+        while self._journaling and self._connection is not None and time.perf_counter() < deadline:
+            self._connection.poll(0.05)
+            self._poll()
+
+    def stop(self):
+        """Stops the capture process, which closes the source."""
+        if self._process is None:
+            return
+        try:
+            self._connection.send('stop')
+        except (OSError, ValueError):
+            pass
+        self._process.join(5.)
+        if self._process.is_alive():
+            logging.warning('The capture process did not stop, terminating it.')
+            self._process.terminate()
+            self._process.join()
+        self._poll()
+        self._process = None
+        self._connection = None
+        self._journaling = False
+
+    def close(self):
+        """Stops the capture for good, releasing the shared memory."""
+        self.stop()
+        if self.ring is not None:
+            self.ring.close()
+
+
+class AsyncStream():
+    """Asynchronous iterator of the blocks of a source, see Source.stream.
+
+    Real time sources are read by an AudioCapture, whose thread wakes the
+    event loop when a chunk arrives, so waiting takes no thread of its own.
+    Each block is everything captured since the previous one (a copy), so a
+    slow consumer gets fewer larger blocks; if it falls behind the ring
+    buffer, the frames overwritten are kept in gaps as 'overrun', with the
+    gaps of the capture once the stream is closed.
+
+    The other sources are read one chunk per block, on the default executor,
+    just when the consumer asks for it.
+
+    Closing the stream (aclose, or leaving ``async with``) stops the
+    capture and closes the source; cancelling the consumer does not, so use
+    ``async with`` to close it in any case.
+
+    Parameters:
+        source (Source): acquisition source, not opened yet.
+        timeout (float): most time (in seconds) waiting for a block, then
+            asyncio.TimeoutError is raised. Default None, no limit.
+        buffer_time (float): time (in seconds) kept in the ring buffer. Default 10 seconds.
+    """
+
+    def __init__(self, source, timeout=None, buffer_time=10.):
+        self.source = source
+        self.timeout = timeout
+        self.buffer_time = buffer_time
+        self.gaps = []
+        self.capture = None
+        self._reader = None
+        self._ready = None
+        self._loop = None
+        self._opened = False
+        self._closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    def _wake(self):
+        # Called on the capture thread after each chunk
+        try:
+            self._loop.call_soon_threadsafe(self._ready.set)
+        except RuntimeError:
+            # The event loop is closed already
+            pass
+
+    async def _open(self):
+        self._loop = asyncio.get_running_loop()
+        self._opened = True
+        if not self.source.realtime:
+            await self._loop.run_in_executor(None, self.source.open)
+            return
+        self._ready = asyncio.Event()
+        self.capture = AudioCapture(self.source, self.buffer_time)
+        self.capture.notify = self._wake
+        await self._loop.run_in_executor(None, self.capture.start)
+        self._reader = self.capture.ring.reader(0)
+
+    async def __anext__(self):
+        if self._closed:
+            raise StopAsyncIteration
+        if not self._opened:
+            await self._open()
+
+        if not self.source.realtime:
+            try:
+                block = await asyncio.wait_for(self._loop.run_in_executor(None, self.source.read), self.timeout)
+            except EOFError:
+                raise StopAsyncIteration
+            return numpy.array(block)
+
+        while True:
+            if self._reader.available():
+                cursor, lost = self._reader.cursor, self._reader.lost
+                views = self._reader.read()
+                if self._reader.lost > lost:
+                    self.gaps.append(Gap(cursor, self._reader.lost - lost, 'overrun'))
+                return numpy.concatenate(views)
+            if not self.capture.is_running():
+                raise StopAsyncIteration
+            self._ready.clear()
+            # A chunk may have come just before clearing
+            if not self._reader.available():
+                await asyncio.wait_for(self._ready.wait(), self.timeout)
+
+    async def aclose(self):
+        """Stops the capture and closes the source."""
+        if self._closed:
+            return
+        self._closed = True
+        if not self._opened:
+            return
+        if self.capture is not None:
+            await self._loop.run_in_executor(None, self.capture.stop)
+            self.gaps.extend(self.capture.gaps)
+            self.gaps.sort()
+        else:
+            await self._loop.run_in_executor(None, self.source.close)
+
+
+class AlignedSource(Source):
+    """Merges several sources (e.g. input devices) onto a common timebase.
+
+    Each source is read by its own AudioCapture, whose clock (start time
+    and actual rate) is measured from its chunk timestamps. Frames are then
+    interpolated on a common grid at the rate given, so sources with
+    different or drifting rates are recorded side by side, the channels of
+    the first source first.
+
+    Parameters:
+        sources (list): real time sources, each one on its own capture thread.
+        interval (float): time (in seconds) read at each call. Default 0.02 seconds.
+        rate (int): common sample rate, in Hz. Default None, the rate of the first source.
+        buffer_time (float): time (in seconds) kept for each source. Default 10 seconds.
+        process (bool): captures each source on its own process instead, see ProcessCapture. Default False.
+    """
+
+    def __init__(self, sources, interval=0.02, rate=None, buffer_time=10., process=False):
+        super(AlignedSource, self).__init__(interval, rate or 22050, 1)
+        self.requested_rate = rate
+        capture_class = ProcessCapture if process else AudioCapture
+        self.captures = [capture_class(source, buffer_time) for source in sources]
+        # Time of the first common frame and frames delivered since then
+        self._t0 = None
+        self.frames = 0
+        self._next = None
+
+    def open(self):
+        for capture in self.captures:
+            capture.start()
+        self.channels = sum(capture.source.channels for capture in self.captures)
+        self.rate = int(self.requested_rate or self.captures[0].source.rate)
+        self.chunk = max(int(self.interval * self.rate), 1)
+        self._t0 = None
+        self.frames = 0
+        self._next = time.perf_counter()
+
+    def close(self):
+        for capture in self.captures:
+            capture.close()
+
+    def reconfigure(self, interval=None, rate=None):
+        if rate is not None:
+            self.requested_rate = rate
+            # The grid starts again at the new rate
+            self._t0 = None
+        super(AlignedSource, self).reconfigure(interval, rate)
+
+    def drift(self):
+        """Returns the drift of each source against the computer clock, in ppm, None if not measured yet."""
+        drifts = []
+        for capture in self.captures:
+            clock = capture.clock()
+            drifts.append(None if clock is None else (clock[1] / capture.source.rate - 1.) * 1e6)
+        return drifts
+
+    def read(self):
+        # Waits for the interval, like an input device would
+        self._next += self.interval
+        delay = self._next - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+        clocks = [capture.clock() for capture in self.captures]
+        if None in clocks:
+            return numpy.empty((0, self.channels))
+        if self._t0 is None:
+            # Starts when every source has started
+            self._t0 = max(start for start, rate in clocks)
+            self.frames = 0
+
+        # Grid frames up to the last one every source has reached
+        end = min(start + (capture.ring.written - 1) / rate for (start, rate), capture in zip(clocks, self.captures))
+        stop = int((end - self._t0) * self.rate) + 1
+        if stop <= self.frames:
+            return numpy.empty((0, self.channels))
+
+        times = self._t0 + numpy.arange(self.frames, stop) / float(self.rate)
+        data_array = numpy.empty((times.shape[0], self.channels))
+        column = 0
+        for (start, rate), capture in zip(clocks, self.captures):
+            # Position of each grid frame among the frames of this source
+            positions = (times - start) * rate
+            first = max(int(positions[0]), 0)
+            views, _, lost = capture.ring.read_since(first)
+            if lost:
+                logging.warning('Aligning lost %d frames of %s.', lost, type(capture.source).__name__)
+            samples = numpy.concatenate(views)
+            indexes = numpy.arange(first + lost, first + lost + samples.shape[0])
+            for channel in range(samples.shape[1]):
+                data_array[:, column] = numpy.interp(positions, indexes, samples[:, channel])
+                column += 1
+        self.frames = stop
+        return data_array
+
+
+class WaveWriter():
+    """Writes samples to a WAVE file as they arrive, in the capture format.
+
+    Samples go straight to disk and the sizes in the header are patched on
+    close, so memory does not grow with the recording. The header reserves
+    room (a JUNK chunk) for the RF64 ds64 chunk: a file past the 4 GB limit
+    of RIFF becomes RF64 on close, or with split the recording goes on in
+    new files (name_001.wav, name_002.wav, ...) before reaching it.
+
+    Parameters:
+        filepath (str): path of the wav file.
+        rate (int): sample rate, in Hz.
+        channels (int): number of channels. Default 1.
+        split (bool): splits in files under 4 GB instead of writing RF64. Default False.
+        sample_format (str): 'int16', 'int24', 'int32' (PCM) or 'float32'. Default 'int16'.
+    """
+
+    # Largest RIFF size, the sizes in the header have 32 bits
+    max_size = 2 ** 32 - 1
+    # RIFF, JUNK (or ds64), fmt and data headers
+    _header_size = 80
+
+    def __init__(self, filepath, rate, channels=1, split=False, sample_format='int16'):
+        if sample_format not in SampleDecoder.formats:
+            raise ValueError('Unknown sample format: {}'.format(sample_format))
+        self.filepath = filepath
+        self.rate = int(rate)
+        self.channels = channels
+        self.split = split
+        self.sample_format = sample_format
+        # Files written, more than one when split
+        self.filepaths = []
+        self._width, _, self._full_scale = SampleDecoder.formats[sample_format]
+        self._frame_size = self._width * channels
+        self._float = sample_format == 'float32'
+        if self._float:
+            # Non PCM formats have the extension size in fmt and a fact chunk
+            self._header_size += 14
+        self._file = None
+        self._open(filepath)
+
+    def _open(self, filepath):
+        self.filepaths.append(filepath)
+        self._data_size = 0
+        self._file = open(filepath, 'wb')
+        self._write_header()
+
+    def _write_header(self):
+        rf64 = self._data_size + self._header_size - 8 > self.max_size
+        if rf64:
+            riff = b'RF64' + struct.pack('<I', 0xFFFFFFFF) + b'WAVE'
+            # Sizes of RIFF, data and samples, with no table of other chunks
+            ds64 = b'ds64' + struct.pack('<IQQQI', 28, self._data_size + self._header_size - 8,
+                                         self._data_size, self._data_size // self._frame_size, 0)
+            data_size = 0xFFFFFFFF
+        else:
+            riff = b'RIFF' + struct.pack('<I', self._data_size + self._header_size - 8) + b'WAVE'
+            ds64 = b'JUNK' + struct.pack('<I', 28) + bytes(28)
+            data_size = self._data_size
+        # Format (PCM or float): channels, rate, bytes per second, bytes per frame and bits per sample
+        fmt = struct.pack('<HHIIHH', 3 if self._float else 1, self.channels, self.rate,
+                          self.rate * self._frame_size, self._frame_size, 8 * self._width)
+        if self._float:
+            frames = min(self._data_size // self._frame_size, 0xFFFFFFFF)
+            fmt = b'fmt ' + struct.pack('<I', 18) + fmt + struct.pack('<H', 0) + b'fact' + struct.pack('<II', 4, frames)
+        else:
+            fmt = b'fmt ' + struct.pack('<I', 16) + fmt
+        self._file.seek(0)
+        self._file.write(riff + ds64 + fmt + b'data' + struct.pack('<I', data_size))
+        self._file.seek(0, os.SEEK_END)
+
+    def write(self, samples):
+        """Appends samples, in volts, shaped (frames, channels) or interleaved.
+
+        Parameters:
+            samples (numpy.ndarray): new samples.
+        """
+        values = numpy.asarray(samples) * (self._full_scale / FULL_SCALE)
+        if self._float:
+            data = values.astype('<f4').tobytes()
+        else:
+            pcm = numpy.clip(values, -self._full_scale, self._full_scale - 1).astype('<i4')
+            if self._width == 2:
+                pcm = pcm.astype('<i2')
+            elif self._width == 3:
+                # Keeps the 3 low bytes of each int32
+                pcm = pcm.view(numpy.uint8).reshape(-1, 4)[:, :3]
+            data = pcm.tobytes()
+        while self.split and self._data_size + len(data) + self._header_size - 8 > self.max_size:
+            # Fills this file with whole frames and goes on in the next one
+            room = self.max_size - self._data_size - self._header_size + 8
+            room -= room % self._frame_size
+            self._file.write(data[:room])
+            self._data_size += room
+            data = data[room:]
+            self._next_file()
+        self._file.write(data)
+        self._data_size += len(data)
+
+    def _next_file(self):
+        self._write_header()
+        self._file.close()
+        name, extension = os.path.splitext(self.filepath)
+        self._open('{}_{:03d}{}'.format(name, len(self.filepaths), extension))
+
+    def close(self):
+        """Writes the final header and closes the file."""
+        self._write_header()
+        self._file.close()
+
+
+class CsvWriter():
+    """Writes samples to a csv file as they arrive, with a time column.
+
+    Parameters:
+        filepath (str): path of the csv file.
+        rate (int): sample rate, in Hz.
+        channels (int): number of channels. Default 1.
+    """
+
+    def __init__(self, filepath, rate, channels=1):
+        self.filepath = filepath
+        self.rate = float(rate)
+        self.channels = channels
+        self.frames = 0
+        self._file = open(filepath, 'w')
+        self._file.write(csv_header(channels) + '\n')
+
+    def write(self, samples):
+        """Appends samples, shaped (frames, channels) or interleaved.
+
+        Parameters:
+            samples (numpy.ndarray): new samples.
+        """
+        frames = numpy.asarray(samples).reshape(-1, self.channels)
+        time = numpy.arange(self.frames, self.frames + frames.shape[0]) / self.rate
+        numpy.savetxt(self._file, numpy.column_stack((time, frames)), fmt='%.10g', delimiter=',')
+        self.frames += frames.shape[0]
+
+    def close(self):
+        """Closes the file."""
+        self._file.close()
+
+
+class NpyWriter():
+    """Writes samples to a numpy .npy file as they arrive.
+
+    The header has a fixed size and gets the final shape on close, so the
+    samples are written straight to disk.
+
+    Parameters:
+        filepath (str): path of the npy file.
+        rate (int): sample rate, in Hz (not stored).
+        channels (int): number of channels. Default 1.
+    """
+
+    _header_size = 128
+
+    def __init__(self, filepath, rate, channels=1):
+        self.filepath = filepath
+        self.channels = channels
+        self.frames = 0
+        self._file = open(filepath, 'wb')
+        self._write_header()
+
+    def _write_header(self):
+        shape = (self.frames,) if self.channels == 1 else (self.frames, self.channels)
+        header = "{{'descr': '<f8', 'fortran_order': False, 'shape': {}, }}".format(shape)
+        # Magic string, version 1.0 and header length take 10 bytes
+        header = header.ljust(self._header_size - 11) + '\n'
+        self._file.seek(0)
+        self._file.write(b'\x93NUMPY\x01\x00' + numpy.uint16(len(header)).astype('<u2').tobytes())
+        self._file.write(header.encode('latin1'))
+
+    def write(self, samples):
+        """Appends samples, shaped (frames, channels) or interleaved.
+
+        Parameters:
+            samples (numpy.ndarray): new samples.
+        """
+        samples = numpy.asarray(samples, dtype='<f8')
+        self._file.write(samples.tobytes())
+        self.frames += samples.size // self.channels
+
+    def close(self):
+        """Writes the final shape in the header and closes the file."""
+        self._write_header()
+        self._file.close()
+
+
+# Writers for each output format
+writers = {'wav': WaveWriter,
+           'csv': CsvWriter,
+           'npy': NpyWriter}
+
+
+class AsyncWriter():
+    """Writes blocks with a writer (e.g. WaveWriter) without blocking the event loop.
+
+    Blocks are written in order by a worker thread of its own. Once
+    queue_size blocks are waiting, write waits for the oldest one, so a slow
+    disk slows down the producer instead of filling the memory. Errors of
+    the writer are raised by the write (or close) that waits for them.
+
+    Parameters:
+        writer (WaveWriter, CsvWriter or NpyWriter): writer of the file, see writers.
+        queue_size (int): blocks waiting to be written before write waits. Default 8.
+    """
+
+    def __init__(self, writer, queue_size=8):
+        self.writer = writer
+        self.queue_size = max(int(queue_size), 1)
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self._pending = collections.deque()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def write(self, block):
+        """Queues a block to be written, waiting while the queue is full.
+
+        Parameters:
+            block (numpy.ndarray): samples, copied so the caller can reuse it.
+        """
+        while len(self._pending) >= self.queue_size:
+            await self._pending.popleft()
+        loop = asyncio.get_running_loop()
+        self._pending.append(loop.run_in_executor(self._executor, self.writer.write, numpy.array(block)))
+
+    async def close(self):
+        """Waits for the queued blocks and closes the file."""
+        try:
+            while self._pending:
+                await self._pending.popleft()
+        finally:
+            await asyncio.get_running_loop().run_in_executor(self._executor, self.writer.close)
+            self._executor.shutdown()
+
+
+class Journal():
+    """Journals samples to disk as they are recorded, so a crash loses at most a second.
+
+    Samples are appended to the journal file (float64 frames, nothing
+    else) and made durable in batches: every sync_interval the file is
+    fsynced and a line with the frames of the batch and their CRC32 is
+    appended to the index (path + '.index', whose first line has the
+    sample interval and channels). See read_journal to recover it.
+
+    Parameters:
+        path (str): path of the journal file.
+        dt (float): sample interval, in seconds.
+        channels (int): number of channels. Default None, one dimensional samples.
+        sync_interval (float): time (in seconds) between fsyncs. Default 1 second.
+    """
+
+    def __init__(self, path, dt, channels=None, sync_interval=1.):
+        self.path = path
+        self.sync_interval = sync_interval
+        self.frames = 0
+        self._file = open(path, 'wb')
+        self._index = open(path + '.index', 'w')
+        self._index.write(json.dumps({'dt': dt, 'channels': channels, 'started': time.time()}) + '\n')
+        # Durable from the start, so an interrupted journal can always be read
+        self._index.flush()
+        os.fsync(self._index.fileno())
+        self._batch_frames = 0
+        self._batch_crc = 0
+        self._synced = time.perf_counter()
+
+    def write(self, samples):
+        """Appends samples, syncing them to disk if the last sync is old enough.
+
+        Parameters:
+            samples (numpy.ndarray): new samples.
+        """
+        samples = numpy.ascontiguousarray(samples, dtype='<f8')
+        data = samples.tobytes()
+        self._file.write(data)
+        self._batch_crc = zlib.crc32(data, self._batch_crc)
+        self._batch_frames += samples.shape[0]
+        self.frames += samples.shape[0]
+        if time.perf_counter() - self._synced >= self.sync_interval:
+            self.sync()
+
+    def sync(self):
+        """Makes the samples written so far durable and indexes them."""
+        self._synced = time.perf_counter()
+        if not self._batch_frames:
+            return
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._index.write('{} {}\n'.format(self._batch_frames, self._batch_crc))
+        self._index.flush()
+        os.fsync(self._index.fileno())
+        self._batch_frames = 0
+        self._batch_crc = 0
+
+    def close(self):
+        """Syncs and closes the journal, keeping it on disk."""
+        if self._file.closed:
+            return
+        self.sync()
+        self._file.close()
+        self._index.close()
+
+    def remove(self):
+        """Closes and deletes the journal, e.g. when its data was saved."""
+        self.close()
+        remove_journal(self.path)
+
+
+def remove_journal(path):
+    """Deletes a journal file and its index, if they exist.
+
+    Parameters:
+        path (str): path of the journal file.
+    """
+    for journal_path in (path, path + '.index'):
+        try:
+            os.remove(journal_path)
+        except OSError as err:
+            if os.path.exists(journal_path):
+                logging.warning('Problem removing %s: %s', journal_path, str(err))
+
+
+def journal_header(path):
+    """Reads the header of a journal (sample interval, channels and start time).
+
+    Parameters:
+        path (str): path of the journal file.
+
+    Returns:
+        dict: the header, None if the journal has no index or its header never reached the disk.
+    """
+    try:
+        with open(path + '.index', 'r') as index:
+            line = index.readline()
+    except FileNotFoundError:
+        return None
+    # A header cut short was never synced, nor anything after it
+    return json.loads(line) if line.endswith('\n') else None
+
+
+def read_journal(path, memory_budget=None, folder=None):
+    """Recovers the samples of a journal, e.g. after a crash.
+
+    Indexed batches are checked against their CRC32, so the recovery stops
+    at the first damaged one; whole frames written after the last sync are
+    recovered as well.
+
+    Parameters:
+        path (str): path of the journal file.
+        memory_budget (int): most bytes kept in memory, see SampleStore. Default None, no limit.
+        folder (str): folder of the spill file. Default None, the temporary folder.
+
+    Returns:
+        tuple: (series, started), the recovered UniformSeries and the time.time
+        the recording started.
+    """
+    header = journal_header(path)
+    if header is None:
+        raise ValueError('Journal {} has no header.'.format(path))
+    with open(path + '.index', 'r') as index:
+        index.readline()
+        batches = [[int(value) for value in line.split()] for line in index if line.strip()]
+
+    channels = header['channels']
+    frame_size = 8 * (channels or 1)
+    series = UniformSeries(header['dt'], samples=SampleStore(channels=channels, memory_budget=memory_budget,
+                                                             folder=folder))
+    with open(path, 'rb') as journal_file:
+        for frames, crc in batches:
+            data = journal_file.read(frames * frame_size)
+            if len(data) < frames * frame_size or zlib.crc32(data) != crc:
+                logging.warning('Journal %s is damaged after %d frames.', path, len(series))
+                return series, header['started']
+            series.append(numpy.frombuffer(data, dtype='<f8').reshape(frames_shape(frames, channels)))
+        # Whatever reached the disk after the last sync, in whole frames
+        data = journal_file.read()
+        frames = len(data) // frame_size
+        if frames:
+            series.append(numpy.frombuffer(data[:frames * frame_size], dtype='<f8')
+                          .reshape(frames_shape(frames, channels)))
+    return series, header['started']
+
+
+def cron_values(field, low, high):
+    """Returns the values of a cron field, e.g. '*', '*/15', '1-5' or '0,30'.
+
+    Parameters:
+        field (str): the field.
+        low (int): lowest value of the field.
+        high (int): highest value of the field.
+    """
+    values = set()
+    for part in field.split(','):
+        step = 1
+        if '/' in part:
+            part, step = part.split('/')
+            step = int(step)
+        if part == '*':
+            first, last = low, high
+        elif '-' in part:
+            first, last = [int(value) for value in part.split('-')]
+        else:
+            first = int(part)
+            last = high if step > 1 else first
+        if first < low or last > high or first > last or step < 1:
+            raise ValueError('Cron field out of range: {}'.format(field))
+        values.update(range(first, last + 1, step))
+    return values
+
+
+class Schedule():
+    """Start and stop times of a sequence of unattended recordings.
+
+    Each run lasts duration seconds and they start either every period
+    seconds ("N runs of T seconds every P minutes") or at the times matching
+    a cron expression, 'minute hour day month weekday' in local time with
+    *, lists, ranges and steps, e.g. '*/15 8-18 * * 1-5'. A run never
+    starts before the previous one stops.
+
+    Parameters:
+        duration (float): length of each run, in seconds.
+        period (float): time between the starts of two runs, in seconds. Default None, see cron.
+        runs (int): number of runs, 0 for no end. Default 0.
+        cron (str): cron expression of the starts. Default None, see period.
+        start (float): time.time of the first run, with period. Default None, now.
+    """
+
+    def __init__(self, duration, period=None, runs=0, cron=None, start=None):
+        if (period is None) == (cron is None):
+            raise ValueError('A schedule needs either a period or a cron expression.')
+        if duration <= 0:
+            raise ValueError('The runs of a schedule need a duration.')
+        if period is not None and period < duration:
+            raise ValueError('The period is shorter than the duration of each run.')
+        self.duration = float(duration)
+        self.period = period
+        self.runs = runs
+        self.cron = cron
+        self.start = time.time() if start is None else start
+        if cron is not None:
+            fields = cron.split()
+            if len(fields) != 5:
+                raise ValueError('A cron expression has 5 fields: {}'.format(cron))
+            self._minutes = cron_values(fields[0], 0, 59)
+            self._hours = cron_values(fields[1], 0, 23)
+            self._days = cron_values(fields[2], 1, 31)
+            self._months = cron_values(fields[3], 1, 12)
+            # Sunday is 0 or 7
+            self._weekdays = set(day % 7 for day in cron_values(fields[4], 0, 7))
+            # Like cron, with both restricted either the day or the weekday matches
+            self._any_day = fields[2] == '*'
+            self._any_weekday = fields[4] == '*'
+        # Runs given so far, the missed ones included, and when the last one stops
+        self.index = 0
+        self._stop = None
+
+    def _day_matches(self, day):
+        in_days = day.day in self._days
+        in_weekdays = day.isoweekday() % 7 in self._weekdays
+        if self._any_day or self._any_weekday:
+            return in_days and in_weekdays
+        return in_days or in_weekdays
+
+    def next_match(self, after):
+        """Returns the time.time of the first minute matching the cron expression, from after on."""
+        day = datetime.datetime.fromtimestamp(math.ceil(after / 60.) * 60)
+        limit = day + datetime.timedelta(days=5 * 366)
+        while day < limit:
+            if day.month not in self._months:
+                day = (day.replace(day=1, hour=0, minute=0) + datetime.timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(day):
+                day = day.replace(hour=0, minute=0) + datetime.timedelta(days=1)
+            elif day.hour not in self._hours:
+                day = day.replace(minute=0) + datetime.timedelta(hours=1)
+            elif day.minute not in self._minutes:
+                day += datetime.timedelta(minutes=1)
+            else:
+                return time.mktime(day.timetuple())
+        raise ValueError('The cron expression never matches: {}'.format(self.cron))
+
+    def next_run(self, now=None):
+        """Returns the (start, stop) time.time of the next run, None after the last one.
+
+        A periodic run already started (e.g. the recording was late) starts
+        now and keeps its stop time; the ones already over are skipped.
+
+        Parameters:
+            now (float): current time.time. Default None, time.time().
+        """
+        now = time.time() if now is None else now
+        after = now if self._stop is None else max(now, self._stop)
+        if self.period is not None:
+            index = max(self.index, int(math.floor((after - self.start - self.duration) / self.period)) + 1)
+            start = self.start + index * self.period
+        else:
+            index = self.index
+            start = self.next_match(after)
+        if self.runs and index >= self.runs:
+            return None
+        self.index = index + 1
+        self._stop = start + self.duration
+        return max(start, now), self._stop
@@ -13,6 +13,7 @@ some simple processing as spectral analysis.
 """
 
 import collections
+import glob
 import json
 import logging
 import os
@@ -23,9 +24,9 @@ import urllib.request
 import numpy as np
 
 # QtPy must be imported before pyqtgraph
-from qtpy.QtCore import QTimer
+from qtpy.QtCore import Qt, QTimer
 from qtpy.QtGui import QPixmap
-from qtpy.QtWidgets import (QApplication, QFileDialog, QMainWindow,
+from qtpy.QtWidgets import (QApplication, QFileDialog, QLabel, QMainWindow,
                             QMessageBox, QSplashScreen)
 
 # Must be set to the same binding here
@@ -38,7 +39,10 @@ import pyqtgraph as pg
 # Then import the own interface
 from wavytool import __version__ as version
 from wavytool import app_name
-from wavytool.core_wavy import AudioRecord
+from wavytool.core_wavy import (STANDARD_RATES, AudioCapture, AudioRecord, FileSource, Gap, Journal, MinMaxPyramid,
+                                ProcessCapture, Resampler, RingBuffer, SampleStore, Schedule, SlidingWindow,
+                                SyntheticSource, Trigger, UniformSeries, input_devices, journal_header, read_journal,
+                                remove_journal, save_gaps)
 from wavytool.gui_wav2dat import ConvertWave2Data
 from wavytool.mw_wavy import Ui_MainWindow
 
@@ -102,174 +106,605 @@ def main():
             data = json.load(json_file)
             window.base_path = data['data_folder']
             logging.info('Data folder is: %s', window.base_path)
+            # Memory (in MB) kept for a recording before it spills to the data folder
+            if 'memory_budget' in data:
+                window.memory_budget = int(data['memory_budget'] * 2 ** 20)
+            # A generated signal ('synthetic') or a file replayed instead of the input device
+            if data.get('source'):
+                window.plot_widget.setSource(data['source'])
+                window.initDevices()
+            # Captures on its own process, so the interface never delays it
+            if data.get('capture_process'):
+                window.plot_widget.restartCapture(process=True)
     except IOError:
         window.getDataFolder()
 
+    window.recoverSession()
+
     return wavy.exec_()
 
 
-class GlobalBuffer():
-    """Allows real-time data transfer between plots."""
+class FrameTimer(QTimer):
+    """Timer that redraws plots at a frame rate, backing off when frames are slow.
 
-    def __init__(self, buffer_size=1024):
-        self.recording = False
-        self.buffer_size = buffer_size
-        self.data = np.empty(self.buffer_size)
-        self.counter = 0
-        self.timestamp = 0
-        self.time_limit = 0
+    When drawing a frame takes more than half of the frame period, the
+    period grows (down to min_fps) so the GUI keeps responsive; it comes
+    back to fps when frames are cheap again. Whatever arrived in between
+    is drawn in the next frame.
 
-    def startRecording(self):
-        self.timestamp = time.time()
-        self.recording = True
+    Parameters:
+        callback (callable): draws a frame.
+        fps (float): frame rate. Default 20 FPS, shouldn't be taxing to most systems.
+        min_fps (float): lowest frame rate when backing off. Default 5 FPS.
+        parent (QObject): parent.
+    """
 
-    def stopRecording(self):
-        self.timestamp = 0
-        self.recording = False
-        self.counter = 0
+    def __init__(self, callback, fps=20., min_fps=5., parent=None):
+        super(FrameTimer, self).__init__(parent)
+        self.callback = callback
+        self.min_fps = min_fps
+        self.setFrameRate(fps)
+        self.timeout.connect(self.frame)
 
-    def clear(self):
-        tmp = self.data
-        self.data[:self.buffer_size] = tmp
-        self.counter = 0
+    def setFrameRate(self, fps):
+        """Sets the frame rate.
+
+        Parameters:
+            fps (float): frames per second.
+        """
+        self.fps = fps
+        self.setInterval(int(1000 / fps))
 
+    def frame(self):
+        """Draws a frame and adapts the period to the time it took."""
+        start = time.perf_counter()
+        self.callback()
+        elapsed = (time.perf_counter() - start) * 1000
 
-global_buffer = GlobalBuffer()
+        interval = self.interval()
+        if elapsed > interval / 2:
+            self.setInterval(min(int(interval * 1.5) + 1, int(1000 / self.min_fps)))
+        elif elapsed < interval / 8 and interval > int(1000 / self.fps):
+            self.setInterval(max(int(interval / 1.5), int(1000 / self.fps)))
 
 
 class RecordingPlotter(pg.PlotWidget):
-    """Plots sub data from real time plotter.
+    """Plots sub data from real time plotter, one curve per channel.
 
     Parameters:
         sample_interval (float): sample interval. Default 0.02 seconds.
         time_window (float): size (in time) for the main window. Default 20 seconds.
         main_window (MainWindow): main_window.
+        fps (float): plot refresh rate, independent of the sample interval. Default 20 FPS.
         parent (QWidget): parent.
     """
 
-    def __init__(self, sample_interval=0.02, time_window=20., main_window=None, parent=None):
+    # Line style of each channel, the color shows the recording state
+    styles = [Qt.SolidLine, Qt.DashLine, Qt.DotLine, Qt.DashDotLine, Qt.DashDotDotLine]
+
+    def __init__(self, sample_interval=0.02, time_window=20., main_window=None, fps=20., parent=None):
         super(RecordingPlotter, self).__init__(parent)
         self.sample_interval = sample_interval
         self.time_window = time_window
+        self.fps = fps
+        self.timer = None
         self.showGrid(x=True, y=True)
         self.setLabel('top', 'Recorded data')
         self.setLabel('left', 'Amplitude', 'V')
         self.setLabel('bottom', 'Time', 's')
-        self.curve = None
+        self.curves = []
         self.main_window = main_window
-        global global_buffer
+        # Stops recording after this time (in seconds), 0 means manual stop
+        self.time_limit = 0
+        self.reader = None
+        self.raw_reader = None
+        self.data = None
+        self.raw = None
+        self.pyramid = None
+        # Recordings past this many bytes spill to a file in this folder
+        self.memory_budget = None
+        self.spill_folder = None
+        # Journals of the values and full rate samples, while recording
+        self.journal = None
+        self.raw_journal = None
+        # Paths of the journals written by a capture process instead, see journalCapture
+        self.capture_journal = None
+        # Capture being recorded and the frames it lost since the recording started
+        self.capture = None
+        self.gaps = []
+        self.gaps_rate = 1.
+        self.counters = collections.Counter()
+        self.gap_lines = []
+        # Trigger armed, the recording starts with pre_time seconds before it
+        self.trigger = None
+        self.pre_time = 0.
+        self.plotItem.sigXRangeChanged.connect(self.updateCurve)
+        self.plotItem.getViewBox().sigResized.connect(self.updateCurve)
+
+    def initData(self, reader=None, raw_reader=None, raw=None):
+        """Initialize data for plotting.
 
-    def initData(self):
-        # Forces update at 20 FPS, shouldn't be taxing to most systems
-        self._interval = int(1 / 20 * 1000)
-        self._bufsize = int(self.time_window / self.sample_interval)
-        self.x = np.linspace(0.0, self.time_window, self._bufsize)
-        self.setDownsampling(mode='peak')
-        self.databuffer = collections.deque([0.0] * self._bufsize, self._bufsize)
-        self.setClipToView(True)
-        self.data = np.empty(5)
-        self.ptr = 0
-        self.counter = 0
-        self.curve = self.plot(self.x[:self.ptr], self.data[:self.ptr], antialias=True)
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.updateplot)
-        self.timer.start(self._interval)
+        Parameters:
+            reader (RingReader): reader of the values to plot, one per sample interval.
+            raw_reader (RingReader): reader of the full rate samples. Default None.
+            raw (UniformSeries): keeps what is read by raw_reader. Default None.
+        """
+        # The previous recording is dropped
+        if self.data is not None:
+            self.data.samples.close()
+        if self.raw is not None and self.raw is not raw:
+            self.raw.samples.close()
+        self.reader = reader
+        self.raw_reader = raw_reader
+        self.raw = raw
+        self.trigger = None
+        self.initGaps()
+        if self.capture is not None and reader is not None:
+            self.alignCapture()
+        channels = reader.ring.channels if reader is not None else None
+        self.data = UniformSeries(self.sample_interval,
+                                  samples=SampleStore(channels=channels, memory_budget=self.memory_budget,
+                                                      folder=self.spill_folder))
+        self.initCurves()
+        if self.timer is not None:
+            self.timer.stop()
+        # Draws whatever was recorded since the last frame
+        self.timer = FrameTimer(self.updateplot, self.fps)
+        self.timer.start()
+
+    def armTrigger(self, trigger, pre_time=0.):
+        """Waits for the trigger before recording what initData was given.
+
+        The values are checked as they come and the recording starts
+        pre_time seconds before the first crossing, taken from the ring
+        buffers of the real time plot, so nothing is kept while waiting.
+
+        Parameters:
+            trigger (Trigger): detector of the start, at the sample interval.
+            pre_time (float): time recorded before the trigger, in seconds. Default 0.
+        """
+        self.trigger = trigger
+        self.pre_time = pre_time
+        self.timer.stop()
+        self.timer = FrameTimer(self.waitTrigger, self.fps)
+        self.timer.start()
+
+    def waitTrigger(self):
+        """Checks the values read since the last call, recording from the trigger on."""
+        values = np.concatenate(self.reader.read())
+        hits = np.flatnonzero(self.trigger.crossings(self.trigger.values(values)))
+        if not hits.shape[0]:
+            return
+
+        ring = self.reader.ring
+        trigger = self.reader.cursor - values.shape[0] + int(hits[0])
+        start = max(trigger - int(round(self.pre_time / self.sample_interval)), ring.written - ring.size, 0)
+        self.reader.cursor = start
+        self.trigger = None
+        self.initGaps()
+        if self.capture is not None:
+            self.alignCapture()
+            if self.capture_journal is not None:
+                self.journalCapture()
+        self.timer.stop()
+        self.timer = FrameTimer(self.updateplot, self.fps)
+        self.timer.start()
+        self.main_window.triggered()
+        self.updateplot()
+
+    def initGaps(self):
+        """Starts counting the gaps of the capture from now on."""
+        self.gaps = []
+        self.counters = collections.Counter()
+        for line in self.gap_lines:
+            self.removeItem(line)
+        self.gap_lines = []
+        if self.capture is not None:
+            self.gaps_rate = float(self.capture.source.rate)
+            self._gap_index = len(self.capture.gaps)
+            self._first_frame = self.capture.ring.written
+        self._reader_lost = self.reader.lost if self.reader is not None else 0
+        self._raw_lost = self.raw_reader.lost if self.raw_reader is not None else 0
+
+    def alignCapture(self):
+        """Starts the captured frames recorded (full rate samples and gaps) at the time of the first value."""
+        capture_ring = self.capture.ring
+        frame = self.main_window.plot_widget.captureFrame(self.reader.cursor)
+        self._first_frame = min(max(frame, capture_ring.written - capture_ring.size, 0), capture_ring.written)
+        if self.raw is not None:
+            self.raw_reader.cursor = self._first_frame
+
+    def checkGaps(self):
+        """Keeps the gaps found since the last call, with a marker for each one."""
+        # Frames lost by the capture
+        gaps = [gap._replace(frame=gap.frame - self._first_frame) for gap in self.capture.gaps[self._gap_index:]]
+        self._gap_index += len(gaps)
+        # Frames overwritten before the plot could read them
+        frame = int(self.data.duration() * self.gaps_rate)
+        if self.reader.lost > self._reader_lost:
+            block = round(self.sample_interval * self.gaps_rate)
+            gaps.append(Gap(frame, (self.reader.lost - self._reader_lost) * block, 'overrun'))
+            self._reader_lost = self.reader.lost
+        if self.raw is not None and self.raw_reader.lost > self._raw_lost:
+            gaps.append(Gap(frame, self.raw_reader.lost - self._raw_lost, 'overrun'))
+            self._raw_lost = self.raw_reader.lost
+
+        for gap in gaps:
+            self.gaps.append(gap)
+            self.counters[gap.reason] += 1
+            self.counters['lost'] += gap.lost
+            line = pg.InfiniteLine(pos=gap.frame / self.gaps_rate, angle=90,
+                                   pen=pg.mkPen((255, 255, 0), style=Qt.DashLine))
+            self.addItem(line)
+            self.gap_lines.append(line)
+
+    def initCurves(self):
+        """Creates a curve for each channel of the data."""
+        # Min and max at several resolutions, to plot just about one point per pixel
+        if self.pyramid is not None:
+            self.pyramid.close()
+        self.pyramid = MinMaxPyramid(self.data.samples)
+        self.pyramid.update()
+        for curve in self.curves:
+            self.removeItem(curve)
+        channels = self.data.samples.channels
+        self.curves = [self.plot(antialias=True) for _ in range(channels or 1)]
+
+    def showRecording(self, data, raw=None):
+        """Shows a recording that is not being recorded now, e.g. a recovered one.
+
+        Parameters:
+            data (UniformSeries): values, one per sample interval.
+            raw (UniformSeries): full rate samples. Default None.
+        """
+        if self.timer is not None:
+            self.timer.stop()
+        self.closeData()
+        self.reader = None
+        self.raw_reader = None
+        self.data = data
+        self.raw = raw
+        self.capture = None
+        self.initGaps()
+        self.initCurves()
+        self.updateCurve()
+
+    def journalCapture(self):
+        """Has the capture process journal the recording from its first frame, see ProcessCapture.start_journal.
+
+        The journals are then written on the capture process, so if this
+        one crashes the recording goes on to its time limit.
+        """
+        path, raw_path = self.capture_journal
+        self.capture.start_journal(path, self.sample_interval, raw_path, self.time_limit, self._first_frame)
+
+    def closeJournals(self):
+        """Syncs and closes the journals, they are kept on disk until removed."""
+        for journal in (self.journal, self.raw_journal):
+            if journal is not None:
+                journal.close()
+        self.journal = None
+        self.raw_journal = None
+        if self.capture_journal is not None and self.capture is not None:
+            self.capture.stop_journal()
+        self.capture_journal = None
+
+    def closeData(self):
+        """Drops the recorded data, removing its spill files."""
+        for series in (self.data, self.raw):
+            if series is not None:
+                series.samples.close()
+        if self.pyramid is not None:
+            self.pyramid.close()
 
     def setSampleInterval(self, sample_interval):
         self.sample_interval = sample_interval
 
     def setTimeWindow(self, time_window):
         self.time_window = time_window
-        self.curve.clear()
-        self.initData()
+        self.initData(self.reader, self.raw_reader, self.raw)
 
     def getdata(self):
-        if global_buffer.time_limit != 0 and self.x[self.ptr] >= global_buffer.time_limit:
-            # TODO: this is not a good way to stop because you need the parent,
-            # and the parents stop method calls your methods.
-            # We need to thing about something different here.
-            self.main_window.stop()
+        """Gets the values recorded since the last call."""
+        if self.capture is not None:
+            self.checkGaps()
+
+        if self.raw is not None:
+            for block in self.raw_reader.read():
+                # Both recordings end at the time limit, the full rate samples come first
+                if self.time_limit != 0:
+                    block = block[:max(int(round(self.time_limit / self.raw.dt)) - len(self.raw), 0)]
+                self.raw.append(block)
+                if self.raw_journal is not None:
+                    self.raw_journal.write(block)
+
+        values = np.concatenate(self.reader.read())
+        if self.time_limit != 0:
+            values = values[:max(int(round(self.time_limit / self.sample_interval)) - len(self.data), 0)]
+        return values
 
-        while (self.counter > global_buffer.counter and self.counter > 0):
-            self.counter -= 1
-
-        return global_buffer.data[(self.counter % global_buffer.buffer_size)]
+    def pause(self):
+        """Pauses reading, what is captured while paused is not recorded."""
+        self.timer.stop()
+
+    def resume(self):
+        """Resumes reading from the newest value."""
+        self.reader.skip()
+        if self.raw is not None:
+            self.raw_reader.skip()
+        # What is lost while paused does not matter
+        if self.capture is not None:
+            self._gap_index = len(self.capture.gaps)
+        if self.trigger is not None:
+            self.trigger.reset()
+        self.timer.start()
 
     def updateplot(self):
         """Update plot."""
-        self.data[self.ptr] = self.getdata()
-        self.x[self.ptr + 1] = self.x[self.ptr] + self.sample_interval
-        self.ptr += 1
-        self.counter += 1
-
-        if self.ptr >= self.data.shape[0]:
-            tmp = self.data
-            xtmp = self.x
-            self.data = np.empty(self.data.shape[0] + 5)
-            self.x = np.empty(self.x.shape[0] + 5)
-            self.data[:tmp.shape[0]] = tmp
-            self.x[:xtmp.shape[0]] = xtmp
-            self.curve.setData(self.x[:self.ptr], self.data[:self.ptr])
+        if self.time_limit != 0 and len(self.data) >= int(round(self.time_limit / self.sample_interval)):
+            # TODO: this is not a good way to stop because you need the parent,
+            # and the parents stop method calls your methods.
+            # We need to thing about something different here.
+            self.main_window.finishRun()
+            return
+
+        new = self.getdata()
+        if new.shape[0]:
+            self.data.append(new)
+            if self.journal is not None:
+                self.journal.write(new)
+            self.pyramid.update()
+            self.updateCurve()
+
+    def updateCurve(self):
+        """Plots the visible range of recorded values, about one min/max pair per pixel."""
+        if not self.curves:
+            return
+
+        start, stop = 0, len(self.data)
+        view_box = self.plotItem.getViewBox()
+        # While following the data the whole recording is visible
+        if not view_box.autoRangeEnabled()[0]:
+            x_min, x_max = view_box.viewRange()[0]
+            start, stop = self.data.index(x_min), self.data.index(x_max) + 2
+
+        indexes, values = self.pyramid.decimate(start, stop, int(view_box.width()))
+        times = self.data.t0 + indexes * self.data.dt
+        values = values.reshape(values.shape[0], -1)
+        for channel, curve in enumerate(self.curves):
+            curve.setData(times, values[:, channel])
 
     def setCurveColor(self, r, g, b):
-        """Set curve color"""
-        self.curve.setPen(pg.mkPen(color=(r, g, b)))
+        """Set curve color, of every channel."""
+        for channel, curve in enumerate(self.curves):
+            curve.setPen(pg.mkPen(color=(r, g, b), style=self.styles[channel % len(self.styles)]))
 
 
 class RealTimeRecordingPlotter(pg.PlotWidget):
-    """Plots data (audio) in real time.
+    """Plots data (audio) in real time, one curve per channel.
 
     Parameters:
         sample_interval (float): sample interval. Default 0.02 seconds.
         time_window (float): size (in time) for the main window. Default 20 seconds.
-        main_window (MainWindow): main_window.
+        fps (float): plot refresh rate, independent of the sample interval. Default 20 FPS.
+        channels (int): number of channels captured. Default 1.
+        device (int): index of the input device. Default None, the default input device.
+        rate (int): sample rate of the input device, in Hz. Default None, its prefered rate.
+        process (bool): captures on its own process, see ProcessCapture. Default False.
+        source (str): 'device' for the input device, 'synthetic' for a generated signal or the path of
+            a wav or npy file replayed in loop. Default 'device'.
         parent (QWidget): parent.
     """
 
-    def __init__(self, sample_interval=0.02, time_window=20., parent=None):
+    # Curve color of each channel
+    colors = [(0, 255, 255), (255, 255, 0), (255, 0, 255), (0, 255, 0),
+              (255, 128, 0), (0, 128, 255), (255, 255, 255), (128, 128, 255)]
+
+    def __init__(self, sample_interval=0.02, time_window=20., fps=20., channels=1, device=None, rate=None,
+                 process=False, source='device', parent=None):
         super(RealTimeRecordingPlotter, self).__init__(parent)
         self.sample_interval = sample_interval
         self.time_window = time_window
+        self.fps = fps
+        self.channels = channels
+        self.device = device
+        self.rate = rate
+        self.process = process
+        self.source = source
+        self.timer = None
         self.showGrid(x=True, y=True)
         self.setLabel('top', 'Input Real Time')
         self.setLabel('left', 'Amplitude', 'V')
         self.setLabel('bottom', 'Time', 's')
-        self.curve = None
-        global global_buffer
+        self.curves = []
+        self.capture = None
+        self.values = None
+        # Input device closed and nothing plotted, see park
+        self.parked = False
 
     def initData(self):
         """Initialize data for for plotting."""
-        # self.sample_interval = 0.01
-        # Forces update at 20 FPS, shouldn't be taxing to most systems
-        self._interval = int(1 / 20 * 1000)
+        # The audio stream is opened once and keeps running, changing the
+        # sample interval or the time window just changes the plotting
+        if self.capture is None:
+            try:
+                self.openCapture()
+            except (IOError, ValueError) as e:
+                # The program still runs, e.g. to try it or replay files on a computer with no sound card
+                QMessageBox.information(self,
+                                        self.tr('Information'),
+                                        self.tr('No input device found, showing a synthetic signal instead. Plug the '
+                                                'input device and choose it in the device list.\n{}'.format(e)),
+                                        QMessageBox.Ok)
+                self.source = 'synthetic'
+                self.openCapture()
+        self.initWindow()
+
+        # Initializes the timer, it draws whatever was acquired since the last frame
+        if self.timer is not None:
+            self.timer.stop()
+        self.timer = FrameTimer(self.updateplot, self.fps)
+        self.timer.start()
+
+    def openCapture(self):
+        """Opens the source (usually the input device) for the number of channels, with a curve for each one."""
+        # Initializes audio listener, it reads the audio on its own thread (or
+        # process) in chunks of 20 ms whatever the sample interval
+        if self.source == 'device':
+            self.audio = AudioRecord("output.wav", 0.02, rate=self.rate, channels=self.channels, device=self.device)
+        elif self.source == 'synthetic':
+            self.audio = SyntheticSource(0.02, self.rate or 44100, self.channels)
+        else:
+            self.audio = FileSource(self.source, 0.02, self.rate, loop=True)
+        capture = ProcessCapture(self.audio) if self.process else AudioCapture(self.audio)
+        capture.start()
+        self.capture = capture
+        # Replayed files have their own number of channels
+        self.channels = self.audio.channels
+
+        self.reader = self.capture.ring.reader()
+        # One value (per channel) per sample interval, kept for the other plots to read
+        self.values = RingBuffer(65536, channels=self.channels)
+
+        for curve in self.curves:
+            self.removeItem(curve)
+        self.curves = [self.plot(pen=self.colors[channel % len(self.colors)], antialias=True)
+                       for channel in range(self.channels)]
+
+    def restartCapture(self, **settings):
+        """Restarts the capture with new settings (channels, device, rate, process and/or source).
+
+        If the input device refuses them, the capture goes on with the
+        previous settings.
+
+        Returns:
+            bool: True if the capture was restarted with the new settings.
+        """
+        previous = {name: getattr(self, name) for name in settings}
+        self.capture.close()
+        self.capture = None
+        for name, value in settings.items():
+            setattr(self, name, value)
+        try:
+            self.openCapture()
+        except (IOError, ValueError) as e:
+            logging.warning('Problem opening the input device with %s: %s', settings, str(e))
+            for name, value in previous.items():
+                setattr(self, name, value)
+            self.openCapture()
+            restarted = False
+        else:
+            restarted = True
+        self.initWindow()
+        return restarted
+
+    def setChannels(self, channels):
+        """Sets the number of channels, restarting the capture.
+
+        Parameters:
+            channels (int): number of channels.
+
+        Returns:
+            bool: True if the input device supports them.
+        """
+        return self.restartCapture(channels=channels) and self.channels == channels
+
+    def setDevice(self, device, channels=None):
+        """Sets the input device, at its prefered rate, restarting the capture.
+
+        Parameters:
+            device (int): index of the input device.
+            channels (int): number of channels. Default None, unchanged.
+
+        Returns:
+            bool: True if the input device could be opened.
+        """
+        if channels is None:
+            channels = self.channels
+        return self.restartCapture(source='device', device=device, rate=None, channels=channels)
+
+    def setSource(self, source):
+        """Sets the source instead of the input device, restarting the capture at the same rate.
+
+        Parameters:
+            source (str): 'synthetic' for a generated signal or the path of a wav or npy file.
+
+        Returns:
+            bool: True if the source could be opened.
+        """
+        return self.restartCapture(source=source, rate=self.rate or self.audio.rate)
+
+    def setDeviceRate(self, rate):
+        """Sets the sample rate of the input device.
+
+        The capture is reconfigured in place, so the plotted values and the
+        captured audio are kept. A capture on its own process is restarted.
+
+        Parameters:
+            rate (int): sample rate, in Hz.
+
+        Returns:
+            bool: True if the input device runs at that rate.
+        """
+        if isinstance(self.capture, ProcessCapture):
+            return self.restartCapture(rate=rate) and self.audio.rate == rate
 
+        # What was captured at the previous rate goes through its resampler
+        self.window.extend(self.getdata())
+        previous = self.rate
+        self.rate = rate
+        try:
+            self.capture.reconfigure(rate=rate)
+        except (IOError, ValueError) as e:
+            logging.warning('Problem opening the input device at %d Hz: %s', rate, str(e))
+            self.rate = previous
+            self.capture.reconfigure(rate=previous)
+        self.initResampler()
+        return self.audio.rate == rate
+
+    def park(self):
+        """Stops plotting and closes the input device, e.g. between scheduled runs."""
+        self.timer.stop()
+        self.capture.stop()
+        self.parked = True
+
+    def unpark(self):
+        """Opens the input device again and plots from now on."""
+        self.capture.resume()
+        self.reader.skip()
+        self.initWindow()
+        self.timer.start()
+        self.parked = False
+
+    def initWindow(self):
+        """Initialize the plotted window for the sample interval and time window."""
         self._bufsize = int(self.time_window / self.sample_interval)
-        self.databuffer = collections.deque([0.0] * self._bufsize, self._bufsize)
+        self.window = SlidingWindow(self._bufsize, channels=self.channels)
         self.x = np.linspace(-self.time_window, 0.0, self._bufsize)
-        self.y = np.zeros(self._bufsize, dtype=np.float)
+        self.initResampler()
+        for curve in self.curves:
+            curve.clear()
 
-        # Initializes audio listener
-        self.audio = AudioRecord("output.wav", self.sample_interval)
+    def initResampler(self):
+        """Resamples the audio captured from now on to one value per sample interval."""
+        self.resampler = Resampler(self.audio.rate, 1. / self.sample_interval)
+        # Value and captured frame the resampler starts at, see captureFrame
+        self._origin = (self.values.written, self.reader.cursor)
 
-        try:
-            self.audio.begin_audio()
-        except IOError as e:
-            QMessageBox.information(self,
-                                    self.tr('Information'),
-                                    self.tr('No input device found, please make sure to plug it before open the '
-                                            'program. Please, restart the program and try again.\n{}'.format(e)),
-                                    QMessageBox.Ok)
-            exit(1)
+    def captureFrame(self, index):
+        """Gets the captured frame at the time of a value.
+
+        The resampler compensates its delay, so value n after it starts
+        is the audio n sample intervals after its first frame.
 
-        # :TODO: needs to be separated the interval of plotting data from the acquire data.
+        Parameters:
+            index (int): sequence number of the value, in values.
 
-        # Initializes the timer
-        self.timer = QTimer()
-        self.timer.timeout.connect(self.updateplot)
-        self.timer.start(self._interval)
-        # Plot for the first time
-        self.curve = self.plot(self.x, self.y, pen=(0, 255, 255), antialias=True)
-        self.curve.clear()
+        Returns:
+            int: sequence number of the frame, in the capture ring buffer.
+        """
+        first_value, first_frame = self._origin
+        return first_frame + int(round((index - first_value) * self.resampler.rate_in / self.resampler.rate_out))
 
     def setSampleInterval(self, sample_interval):
         """Sets the sample interval for plotting.
@@ -278,8 +713,7 @@ class RealTimeRecordingPlotter(pg.PlotWidget):
             sample_interval (float): sample interval in seconds
         """
         self.sample_interval = sample_interval
-        self.curve.clear()
-        self.initData()
+        self.initWindow()
 
     def setTimeWindow(self, time_window):
         """Sets the time window for plotting.
@@ -288,35 +722,33 @@ class RealTimeRecordingPlotter(pg.PlotWidget):
             time_window (float): size (in time) for the main window, in seconds.
         """
         self.time_window = time_window
-        self.curve.clear()
-        self.initData()
+        self.initWindow()
 
     def getdata(self):
-        """Gets data for plotting."""
-        b = self.audio.get_data_from_audio()[1]
-        new = b[0]
+        """Gets data for plotting, one value (per channel) for each sample interval.
+
+        The captured audio is low pass filtered before, so sounds faster
+        than the sample interval do not show up as slow waves (aliasing).
+        """
+        # Takes everything captured since the last call, it does not block
+        samples = np.concatenate(self.reader.read())
+        new = self.resampler.process(samples)
 
         # This clipping of the signal prevents pyqtgraph from breaking due
         # to large random noise when some soundcards are initiated.
         # Prevents input overflow when program starts.
-        if new > 1e+150:
-            new = 1e+150
+        np.minimum(new, 1e+150, out=new)
 
-        if global_buffer.recording is True:
-            global_buffer.counter += 1
-            if global_buffer.counter >= global_buffer.buffer_size:
-                global_buffer.clear()
-
-            global_buffer.data[global_buffer.counter] = new
+        self.values.write(new)
 
         return new
 
     def updateplot(self):
         """Update plot."""
-        stp = self.getdata()
-        self.databuffer.append(stp)
-        self.y[:] = self.databuffer
-        self.curve.setData(self.x, self.y)
+        self.window.extend(self.getdata())
+        window = self.window.view()
+        for channel, curve in enumerate(self.curves):
+            curve.setData(self.x, window[:, channel])
 
 
 class MainWindow(QMainWindow):
@@ -325,9 +757,15 @@ class MainWindow(QMainWindow):
         parent (QWidget): parent
     """
 
-    def __init__(self, parent=None):
-        global global_buffer
+    # Trigger (mode, edge) of each item of comboBoxTrigger, None records right away
+    triggers = [None, ('level', 'rising'), ('level', 'falling'), ('slope', 'rising'), ('slope', 'falling'),
+                ('rms', 'rising'), ('rms', 'falling')]
+    # Data of the items of comboBoxDevice that are not input devices
+    synthetic_item = -1
+    replay_item = -2
+    open_file_item = -3
 
+    def __init__(self, parent=None):
         super(MainWindow, self).__init__(parent)
         self.ui = Ui_MainWindow()
         self.ui.setupUi(self)
@@ -338,11 +776,22 @@ class MainWindow(QMainWindow):
         self.filepath = ""
         # Initial state is none because there is no data acquired yet
         self.isSaved = None
-        # Sample interval should be 0.02s to not overflow in XP
-        self.ui.doubleSpinBoxSampleInterval.setMinimum(0.02)
+        # Journals of the data not saved yet, removed once it is saved or discarded
+        self.journal_paths = []
+        # Scheduled runs, each one saved to its own file, and the timer of the next one
+        self.schedule = None
+        self.schedule_timer = QTimer(self)
+        self.schedule_timer.setSingleShot(True)
+        self.schedule_timer.timeout.connect(self.startRun)
+        # Acquisition does not depend on the plot refresh rate, so 1 kHz is fine
+        self.ui.doubleSpinBoxSampleInterval.setMinimum(0.001)
         self.ui.doubleSpinBoxSampleInterval.setMaximum(0.5)
         self.ui.doubleSpinBoxSampleInterval.setValue(0.02)
-        self.ui.doubleSpinBoxSampleInterval.setSingleStep(0.01)
+        self.ui.doubleSpinBoxSampleInterval.setSingleStep(0.001)
+        self.ui.doubleSpinBoxSampleRate.setMaximum(1000.)
+        # Long recordings spill to the data folder, so they can last days
+        self.memory_budget = 512 * 2 ** 20
+        self.ui.spinBoxStopRecordingAfter.setMaximum(7 * 24 * 3600)
 
         # Connecting actions
         # File actions
@@ -386,6 +835,18 @@ class MainWindow(QMainWindow):
 
         # self.ui.doubleSpinBoxSampleRate.valueChanged.connect(self.setSampleInterval)
         self.ui.spinBoxWindowTime.valueChanged.connect(self.plot_widget.setTimeWindow)
+
+        # Frames lost by the capture and by the recording, in the status bar
+        self.labelLost = QLabel()
+        self.ui.statusbar.addPermanentWidget(self.labelLost)
+        self.status_timer = QTimer(self)
+        self.status_timer.timeout.connect(self.updateStatus)
+        self.status_timer.start(1000)
+        self.updateStatus()
+        self.ui.spinBoxChannels.valueChanged.connect(self.setChannels)
+        self.initDevices()
+        self.ui.comboBoxDevice.currentIndexChanged.connect(self.setDevice)
+        self.ui.comboBoxDeviceRate.currentIndexChanged.connect(self.setDeviceRate)
         self.setSampleRate(self.ui.doubleSpinBoxSampleInterval.value())
 
     def checkUpdate(self):
@@ -420,6 +881,168 @@ class MainWindow(QMainWindow):
         """Sets sample interval."""
         self.ui.doubleSpinBoxSampleInterval.setValue(1. / sample_rate)
 
+    def setChannels(self, channels):
+        """Sets the number of channels captured, back to the previous one if not supported."""
+        if not self.plot_widget.setChannels(channels):
+            QMessageBox.warning(self,
+                                self.tr('Warning'),
+                                self.tr('The input device does not support {} channels.'.format(channels)),
+                                QMessageBox.Ok)
+            self.ui.spinBoxChannels.blockSignals(True)
+            self.ui.spinBoxChannels.setValue(self.plot_widget.channels)
+            self.ui.spinBoxChannels.blockSignals(False)
+
+    def initDevices(self):
+        """Lists the input devices and the other sources, selecting the one in use."""
+        source = self.plot_widget.source
+        self.devices = input_devices(getattr(self.plot_widget.audio, 'port', None))
+        combo = self.ui.comboBoxDevice
+        combo.blockSignals(True)
+        combo.clear()
+        for device in self.devices:
+            combo.addItem('{} ({})'.format(device.name, device.host_api), device.index)
+            combo.setItemData(combo.count() - 1,
+                              self.tr('{} channels, {:.1f} ms latency'.format(device.channels, device.latency * 1000)),
+                              Qt.ToolTipRole)
+        # Sources with no sound card, their data is negative
+        combo.addItem(self.tr('Synthetic signal'), self.synthetic_item)
+        if source not in ('device', 'synthetic'):
+            combo.addItem(self.tr('Replay {}'.format(os.path.basename(source))), self.replay_item)
+        combo.addItem(self.tr('Replay a file...'), self.open_file_item)
+        if source == 'device':
+            combo.setCurrentIndex(combo.findData(self.plot_widget.audio.device_index))
+        else:
+            combo.setCurrentIndex(combo.findData(self.synthetic_item if source == 'synthetic' else self.replay_item))
+        combo.blockSignals(False)
+        self.initDeviceRates()
+
+    def initDeviceRates(self):
+        """Lists the rates supported by the input device in use, selecting the current one."""
+        audio = self.plot_widget.audio
+        # A synthetic signal runs at any rate, a replayed file at its own
+        rates = STANDARD_RATES if self.plot_widget.source == 'synthetic' else []
+        for device in self.devices:
+            if self.plot_widget.source == 'device' and device.index == audio.device_index:
+                rates = device.rates
+                self.ui.spinBoxChannels.setMaximum(device.channels)
+        # The rate in use may be out of the standard ones
+        rates = sorted(set(rates) | {audio.rate})
+        combo = self.ui.comboBoxDeviceRate
+        combo.blockSignals(True)
+        combo.clear()
+        for rate in rates:
+            combo.addItem('{} Hz'.format(rate), rate)
+        combo.setCurrentIndex(combo.findData(audio.rate))
+        combo.blockSignals(False)
+
+    def setDevice(self, index):
+        """Sets the input device (or other source), back to the previous one if it cannot be opened."""
+        item = self.ui.comboBoxDevice.itemData(index)
+        if item == self.synthetic_item:
+            opened, name = self.plot_widget.setSource('synthetic'), self.tr('synthetic signal')
+        elif item == self.replay_item:
+            opened, name = True, None
+        elif item == self.open_file_item:
+            name = QFileDialog.getOpenFileName(self,
+                                               self.tr('Replay a file'),
+                                               self.base_path,
+                                               self.tr('Recordings (*.wav *.npy)'))[0]
+            opened = not name or self.plot_widget.setSource(name)
+        else:
+            device = self.devices[index]
+            name = device.name
+            opened = self.plot_widget.setDevice(device.index, min(self.plot_widget.channels, device.channels))
+        if not opened:
+            QMessageBox.warning(self,
+                                self.tr('Warning'),
+                                self.tr('There was a problem opening the input device {}.'.format(name)),
+                                QMessageBox.Ok)
+        self.ui.spinBoxChannels.blockSignals(True)
+        self.ui.spinBoxChannels.setValue(self.plot_widget.channels)
+        self.ui.spinBoxChannels.blockSignals(False)
+        self.initDevices()
+
+    def setDeviceRate(self, index):
+        """Sets the sample rate of the input device."""
+        rate = self.ui.comboBoxDeviceRate.itemData(index)
+        if not self.plot_widget.setDeviceRate(rate):
+            QMessageBox.warning(self,
+                                self.tr('Warning'),
+                                self.tr('The input device does not support {} Hz.'.format(rate)),
+                                QMessageBox.Ok)
+        # The device may fall back to another rate
+        self.initDeviceRates()
+
+    def lostText(self, counters):
+        """Describes the frames lost and why."""
+        if not counters['lost']:
+            return self.tr('no frames lost')
+        reasons = ', '.join('{} {}'.format(count, reason) for reason, count in sorted(counters.items())
+                            if reason != 'lost')
+        return self.tr('{} frames lost ({})'.format(counters['lost'], reasons))
+
+    def updateStatus(self):
+        """Shows the frames lost since the input was opened and in the recording."""
+        text = self.tr('Input: ') + self.lostText(self.plot_widget.capture.counters)
+        if self.plot_widget_rec.data is not None:
+            text += self.tr(' | Recording: ') + self.lostText(self.plot_widget_rec.counters)
+        lost = self.plot_widget_rec.counters['lost'] if self.plot_widget_rec.data is not None else 0
+        self.labelLost.setStyleSheet('color: red' if lost else '')
+        self.labelLost.setText(text)
+
+    def discardJournals(self):
+        """Removes the journals of the current data, once it is saved or dropped."""
+        self.plot_widget_rec.closeJournals()
+        for path in self.journal_paths:
+            remove_journal(path)
+        self.journal_paths = []
+
+    def recoverSession(self):
+        """Offers to recover a recording interrupted by a crash, from its journals."""
+        for path in sorted(glob.glob(os.path.join(self.base_path, '*.values.wavj'))):
+            session = path[:-len('.values.wavj')]
+            journal_paths = [path, session + '.raw.wavj']
+            if journal_header(path) is None:
+                # Interrupted before anything was journaled, there is nothing to recover
+                for journal_path in journal_paths:
+                    remove_journal(journal_path)
+                continue
+
+            answer = QMessageBox.question(self,
+                                          self.tr('Question'),
+                                          self.tr('The recording {} was interrupted. Do you want to recover '
+                                                  'it?'.format(os.path.basename(session))),
+                                          QMessageBox.Yes | QMessageBox.No)
+            if answer != QMessageBox.Yes:
+                for journal_path in journal_paths:
+                    remove_journal(journal_path)
+                continue
+
+            try:
+                data, started = read_journal(path, self.memory_budget, self.base_path)
+                raw = None
+                if journal_header(journal_paths[1]) is not None:
+                    raw = read_journal(journal_paths[1], self.memory_budget, self.base_path)[0]
+            except (IOError, ValueError, KeyError) as e:
+                QMessageBox.critical(self,
+                                     self.tr('Critical'),
+                                     self.tr('There was a problem to recover the recording:\n {}'.format(str(e))),
+                                     QMessageBox.Ok)
+                continue
+
+            logging.info('Recovered %.3f s recorded on %s', data.duration(), time.ctime(started))
+            self.journal_paths = journal_paths
+            self.filepath = session
+            self.setWindowFilePath(self.filepath)
+            self.plot_widget_rec.showRecording(data, raw)
+            self.plot_widget_rec.setCurveColor(0, 255, 0)
+            self.plot_widget_rec.setLabel('top', 'Recovered ...')
+            self.isSaved = False
+            self.ui.actionSave_As.setEnabled(True)
+            self.ui.actionPrint_graph.setEnabled(True)
+            # Just one recording is shown, the others are offered next time
+            break
+
     def callTools(self):
         """Call converting tool."""
         dlg = ConvertWave2Data()
@@ -436,8 +1059,6 @@ class MainWindow(QMainWindow):
 
     def record(self):
         """Starts acquiring."""
-        # Create a new filename for the current acquisition
-        self.createFileName()
         # Checks if is saved before start a new recording
         if self.isSaved is False:
             answer = QMessageBox.question(
@@ -447,13 +1068,32 @@ class MainWindow(QMainWindow):
                 QMessageBox.Yes | QMessageBox.No)
             if answer == QMessageBox.Yes:
                 self.saveFileAs()
+        self.discardJournals()
 
-        if self.plot_widget_rec.curve is not None:
-            self.plot_widget_rec.curve.clear()
+        # Runs of the stop recording time, repeated every some minutes
+        self.schedule = None
+        if self.ui.spinBoxRepeatEvery.value():
+            try:
+                self.schedule = Schedule(self.ui.spinBoxStopRecordingAfter.value(),
+                                         self.ui.spinBoxRepeatEvery.value() * 60.,
+                                         self.ui.spinBoxRuns.value())
+            except ValueError as e:
+                QMessageBox.warning(self,
+                                    self.tr('Warning'),
+                                    self.tr('The recordings cannot be scheduled:\n{}'.format(str(e))),
+                                    QMessageBox.Ok)
+                self.ui.actionRecord.setChecked(False)
+                return
+            # A run waiting for its trigger would never reach its stop time
+            if self.triggers[self.ui.comboBoxTrigger.currentIndex()] is not None:
+                QMessageBox.warning(self,
+                                    self.tr('Warning'),
+                                    self.tr('A schedule cannot be used with a trigger.'),
+                                    QMessageBox.Ok)
+                self.schedule = None
+                self.ui.actionRecord.setChecked(False)
+                return
 
-        self.plot_widget_rec.initData()
-        self.plot_widget_rec.setCurveColor(255, 0, 0)
-        self.plot_widget_rec.setLabel('top', 'Recording ...')
         # Set enabled buttons
         self.ui.actionPause.setEnabled(True)
         self.ui.actionStop.setEnabled(True)
@@ -463,16 +1103,128 @@ class MainWindow(QMainWindow):
         self.ui.doubleSpinBoxSampleInterval.setEnabled(False)
         self.ui.doubleSpinBoxSampleRate.setEnabled(False)
         self.ui.spinBoxStopRecordingAfter.setEnabled(False)
+        self.ui.checkBoxFullRate.setEnabled(False)
+        self.ui.spinBoxChannels.setEnabled(False)
+        self.ui.comboBoxDevice.setEnabled(False)
+        self.ui.comboBoxDeviceRate.setEnabled(False)
+        self.ui.comboBoxTrigger.setEnabled(False)
+        self.ui.doubleSpinBoxTriggerLevel.setEnabled(False)
+        self.ui.doubleSpinBoxPreTrigger.setEnabled(False)
+        self.ui.spinBoxRepeatEvery.setEnabled(False)
+        self.ui.spinBoxRuns.setEnabled(False)
         # Set enabled tool bar and menu
         self.ui.toolBarFile.setEnabled(False)
         self.ui.menuFile.setEnabled(False)
         self.ui.menuTools.setEnabled(False)
 
-        global_buffer.time_limit = self.ui.spinBoxStopRecordingAfter.value()
-        global_buffer.startRecording()
-
+        if self.schedule is not None:
+            self.nextRun()
+        else:
+            self.startRun()
+
+    def startRun(self):
+        """Starts recording to a new file, once or as a run of the schedule."""
+        if self.plot_widget.parked:
+            self.plot_widget.unpark()
+            self.status_timer.start(1000)
+            self.ui.actionPause.setEnabled(True)
+        # Create a new filename for the current acquisition
+        self.createFileName()
         self.isSaved = False
 
+        # Full rate recordings read the captured audio as well
+        if self.ui.checkBoxFullRate.isChecked():
+            raw_reader = self.plot_widget.capture.ring.reader()
+            raw = UniformSeries(1. / self.plot_widget.audio.rate,
+                                samples=SampleStore(channels=self.plot_widget.channels,
+                                                    memory_budget=self.memory_budget, folder=self.base_path))
+        else:
+            raw_reader = None
+            raw = None
+
+        self.plot_widget_rec.time_limit = self.ui.spinBoxStopRecordingAfter.value()
+        self.plot_widget_rec.memory_budget = self.memory_budget
+        self.plot_widget_rec.spill_folder = self.base_path
+        self.plot_widget_rec.capture = self.plot_widget.capture
+        # Journals the recording as it goes, so a crash does not lose it
+        self.journal_paths = [self.filepath + '.values.wavj']
+        if raw is not None:
+            self.journal_paths.append(self.filepath + '.raw.wavj')
+        if isinstance(self.plot_widget.capture, ProcessCapture):
+            # By the capture process, from the first frame recorded
+            raw_path = self.journal_paths[1] if raw is not None else None
+            self.plot_widget_rec.capture_journal = (self.journal_paths[0], raw_path)
+        else:
+            self.plot_widget_rec.journal = Journal(self.journal_paths[0], self.plot_widget_rec.sample_interval,
+                                                   self.plot_widget.channels)
+            if raw is not None:
+                self.plot_widget_rec.raw_journal = Journal(self.journal_paths[1], raw.dt, self.plot_widget.channels)
+        self.plot_widget_rec.initData(self.plot_widget.values.reader(), raw_reader, raw)
+        trigger = self.triggers[self.ui.comboBoxTrigger.currentIndex()]
+        if trigger is None:
+            if self.plot_widget_rec.capture_journal is not None:
+                self.plot_widget_rec.journalCapture()
+            self.plot_widget_rec.setCurveColor(255, 0, 0)
+            self.plot_widget_rec.setLabel('top', 'Recording ...')
+        else:
+            # The values are checked, one per sample interval, the rms over ten of them
+            mode, edge = trigger
+            rate = 1. / self.plot_widget_rec.sample_interval
+            self.plot_widget_rec.armTrigger(Trigger(self.ui.doubleSpinBoxTriggerLevel.value(), mode, edge, rate,
+                                                    rms_time=10. / rate),
+                                            self.ui.doubleSpinBoxPreTrigger.value())
+            self.plot_widget_rec.setLabel('top', 'Waiting for trigger ...')
+
+    def nextRun(self):
+        """Starts the next run of the schedule, waiting for it with the input device closed."""
+        run = self.schedule.next_run()
+        if run is None:
+            self.stop()
+            return
+
+        start, stop = run
+        delay = start - time.time()
+        if delay <= 0:
+            # A late run keeps its stop time
+            self.startRun()
+            self.plot_widget_rec.time_limit = stop - start
+            return
+
+        # Nothing runs until the next run, neither the input device nor the plots
+        self.plot_widget.park()
+        self.status_timer.stop()
+        self.ui.actionPause.setEnabled(False)
+        text = self.tr('Run {} at {}'.format(self.schedule.index, time.strftime('%H:%M:%S', time.localtime(start))))
+        self.plot_widget_rec.setLabel('top', text)
+        self.labelLost.setText(text)
+        self.schedule_timer.start(int(delay * 1000))
+
+    def finishRun(self):
+        """Ends the recording when its time is over, saving it if it is a run of the schedule."""
+        if self.schedule is None:
+            self.stop()
+            return
+
+        self.plot_widget_rec.timer.stop()
+        self.plot_widget_rec.closeJournals()
+        self.plot_widget_rec.setCurveColor(0, 255, 0)
+        try:
+            self.saveCSVFile(self.filepath)
+        except Exception as e:
+            # The journals are kept, the run can be recovered later
+            logging.error('Problem saving the run to %s: %s', self.filepath, str(e))
+            self.journal_paths = []
+        else:
+            logging.info('The run was saved in the file: %s', self.filepath)
+            self.isSaved = True
+            self.discardJournals()
+        self.nextRun()
+
+    def triggered(self):
+        """Shows that the trigger started the recording."""
+        self.plot_widget_rec.setCurveColor(255, 0, 0)
+        self.plot_widget_rec.setLabel('top', 'Recording ...')
+
     def pause(self):
         """Pauses acquiring."""
         # TODO: We need to discuss if this is needed
@@ -480,25 +1232,32 @@ class MainWindow(QMainWindow):
 
         if self.ui.actionPause.isChecked():
             # Stopping changing color and label
-            self.plot_widget_rec.timer.stop()
+            self.plot_widget_rec.pause()
             self.plot_widget_rec.setCurveColor(255, 153, 0)
             self.plot_widget_rec.setLabel('top', 'Paused ...')
-            global_buffer.stopRecording()
         else:
             # Starting changing color and label
-            self.plot_widget_rec.timer.start()
-            self.plot_widget_rec.setCurveColor(255, 0, 0)
-            self.plot_widget_rec.setLabel('top', 'Recording ...')
-            global_buffer.startRecording()
+            self.plot_widget_rec.resume()
+            if self.plot_widget_rec.trigger is None:
+                self.plot_widget_rec.setCurveColor(255, 0, 0)
+                self.plot_widget_rec.setLabel('top', 'Recording ...')
+            else:
+                self.plot_widget_rec.setLabel('top', 'Waiting for trigger ...')
         # Set enabled tool bar
         self.ui.toolBarFile.setEnabled(False)
         self.ui.menuFile.setEnabled(False)
         self.ui.menuTools.setEnabled(False)
 
     def stop(self):
-        """Stops acquiring."""
+        """Stops acquiring, the scheduled runs as well."""
+        self.schedule = None
+        self.schedule_timer.stop()
+        if self.plot_widget.parked:
+            self.plot_widget.unpark()
+            self.status_timer.start(1000)
         # Stopping changing color and label
         self.plot_widget_rec.timer.stop()
+        self.plot_widget_rec.closeJournals()
         self.plot_widget_rec.setCurveColor(0, 255, 0)
         self.plot_widget_rec.setLabel('top', 'Stopped ...')
         # Set checked
@@ -513,6 +1272,15 @@ class MainWindow(QMainWindow):
         self.ui.doubleSpinBoxSampleRate.setEnabled(True)
         self.ui.spinBoxWindowTime.setEnabled(True)
         self.ui.spinBoxStopRecordingAfter.setEnabled(True)
+        self.ui.checkBoxFullRate.setEnabled(True)
+        self.ui.spinBoxChannels.setEnabled(True)
+        self.ui.comboBoxDevice.setEnabled(True)
+        self.ui.comboBoxDeviceRate.setEnabled(True)
+        self.ui.comboBoxTrigger.setEnabled(True)
+        self.ui.doubleSpinBoxTriggerLevel.setEnabled(True)
+        self.ui.doubleSpinBoxPreTrigger.setEnabled(True)
+        self.ui.spinBoxRepeatEvery.setEnabled(True)
+        self.ui.spinBoxRuns.setEnabled(True)
         # Set enabled tool bar
         self.ui.toolBarFile.setEnabled(True)
         self.ui.menuFile.setEnabled(True)
@@ -521,8 +1289,6 @@ class MainWindow(QMainWindow):
         self.ui.actionSave_As.setEnabled(True)
         self.ui.actionPrint_graph.setEnabled(True)
 
-        global_buffer.stopRecording()
-
     def savePNGFile(self, filepath):
         """Saves an image."""
         # This extension should not be removed
@@ -540,8 +1306,14 @@ class MainWindow(QMainWindow):
         # Exporter needs the extension to save correctly.
         filepath += ".csv"
         logging.info('File path to save data: %s', filepath)
-        exporter = pg.exporters.CSVExporter(self.plot_widget_rec.plotItem)
-        exporter.export(filepath)
+        # Full rate recordings are saved with every sample, not just the plotted ones
+        if self.plot_widget_rec.raw is not None:
+            self.plot_widget_rec.raw.save_csv(filepath)
+        else:
+            self.plot_widget_rec.data.save_csv(filepath)
+        # Where data was lost, next to the data
+        if self.plot_widget_rec.gaps:
+            save_gaps(filepath[:-len('.csv')] + '.gaps.csv', self.plot_widget_rec.gaps, self.plot_widget_rec.gaps_rate)
 
     def getDataFolder(self):
         """Get data folder option."""
@@ -621,13 +1393,12 @@ class MainWindow(QMainWindow):
                                      QMessageBox.Ok)
             else:
                 self.isSaved = True
+                self.discardJournals()
                 # self.ui.actionSave_As.setEnabled(False)
                 logging.info('The data was saved in the file: %s', self.filepath)
                 QMessageBox.information(self,
                                         self.tr('Information'),
-                                        self.tr('Data was successfully saved.\n\nDATA SAVED IS REPRESENTED '
-                                                'BY THE WINDOW RECORDING, IF YOU APPLY ZOOM ON IT, JUST '
-                                                'DATA VISIBLE WILL BE SAVED!'),
+                                        self.tr('Data was successfully saved.'),
                                         QMessageBox.Ok)
 
     def about(self):
@@ -661,10 +1432,13 @@ class MainWindow(QMainWindow):
         """Re implements close event."""
         if self.closeQuestion():
             self.plot_widget.timer.stop()
-            self.plot_widget.audio.end_audio()
+            self.plot_widget.capture.close()
 
-            if self.plot_widget_rec.curve is not None:
+            if self.plot_widget_rec.timer is not None:
                 self.plot_widget_rec.timer.stop()
+            # Closing is a choice to drop what was not saved
+            self.discardJournals()
+            self.plot_widget_rec.closeData()
 
             event.accept()
         else:
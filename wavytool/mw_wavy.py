@@ -38,7 +38,7 @@ class Ui_MainWindow(object):
         self.doubleSpinBoxScale.setObjectName("doubleSpinBoxScale")
         self.gridLayout.addWidget(self.doubleSpinBoxScale, 7, 2, 1, 1)
         spacerItem = QtWidgets.QSpacerItem(20, 40, QtWidgets.QSizePolicy.Minimum, QtWidgets.QSizePolicy.Expanding)
-        self.gridLayout.addItem(spacerItem, 11, 2, 1, 1)
+        self.gridLayout.addItem(spacerItem, 23, 2, 1, 1)
         self.labelWindowTime = QtWidgets.QLabel(self.widget)
         self.labelWindowTime.setObjectName("labelWindowTime")
         self.gridLayout.addWidget(self.labelWindowTime, 4, 0, 1, 5)
@@ -57,7 +57,74 @@ class Ui_MainWindow(object):
         self.labelAbout.setTextFormat(QtCore.Qt.RichText)
         self.labelAbout.setWordWrap(True)
         self.labelAbout.setObjectName("labelAbout")
-        self.gridLayout.addWidget(self.labelAbout, 12, 0, 1, 5)
+        self.gridLayout.addWidget(self.labelAbout, 24, 0, 1, 5)
+        self.labelChannels = QtWidgets.QLabel(self.widget)
+        self.labelChannels.setObjectName("labelChannels")
+        self.gridLayout.addWidget(self.labelChannels, 11, 0, 1, 5)
+        self.spinBoxChannels = QtWidgets.QSpinBox(self.widget)
+        self.spinBoxChannels.setAlignment(QtCore.Qt.AlignRight|QtCore.Qt.AlignTrailing|QtCore.Qt.AlignVCenter)
+        self.spinBoxChannels.setMinimum(1)
+        self.spinBoxChannels.setMaximum(8)
+        self.spinBoxChannels.setObjectName("spinBoxChannels")
+        self.gridLayout.addWidget(self.spinBoxChannels, 12, 0, 1, 5)
+        self.labelDevice = QtWidgets.QLabel(self.widget)
+        self.labelDevice.setObjectName("labelDevice")
+        self.gridLayout.addWidget(self.labelDevice, 13, 0, 1, 5)
+        self.comboBoxDevice = QtWidgets.QComboBox(self.widget)
+        self.comboBoxDevice.setObjectName("comboBoxDevice")
+        self.gridLayout.addWidget(self.comboBoxDevice, 14, 0, 1, 5)
+        self.labelDeviceRate = QtWidgets.QLabel(self.widget)
+        self.labelDeviceRate.setObjectName("labelDeviceRate")
+        self.gridLayout.addWidget(self.labelDeviceRate, 15, 0, 1, 5)
+        self.comboBoxDeviceRate = QtWidgets.QComboBox(self.widget)
+        self.comboBoxDeviceRate.setObjectName("comboBoxDeviceRate")
+        self.gridLayout.addWidget(self.comboBoxDeviceRate, 16, 0, 1, 5)
+        self.labelTrigger = QtWidgets.QLabel(self.widget)
+        self.labelTrigger.setObjectName("labelTrigger")
+        self.gridLayout.addWidget(self.labelTrigger, 17, 0, 1, 5)
+        self.comboBoxTrigger = QtWidgets.QComboBox(self.widget)
+        self.comboBoxTrigger.setObjectName("comboBoxTrigger")
+        self.comboBoxTrigger.addItem("")
+        self.comboBoxTrigger.addItem("")
+        self.comboBoxTrigger.addItem("")
+        self.comboBoxTrigger.addItem("")
+        self.comboBoxTrigger.addItem("")
+        self.comboBoxTrigger.addItem("")
+        self.comboBoxTrigger.addItem("")
+        self.gridLayout.addWidget(self.comboBoxTrigger, 18, 0, 1, 3)
+        self.doubleSpinBoxTriggerLevel = QtWidgets.QDoubleSpinBox(self.widget)
+        self.doubleSpinBoxTriggerLevel.setAlignment(QtCore.Qt.AlignRight|QtCore.Qt.AlignTrailing|QtCore.Qt.AlignVCenter)
+        self.doubleSpinBoxTriggerLevel.setDecimals(3)
+        self.doubleSpinBoxTriggerLevel.setMinimum(-1000.0)
+        self.doubleSpinBoxTriggerLevel.setMaximum(1000.0)
+        self.doubleSpinBoxTriggerLevel.setSingleStep(0.1)
+        self.doubleSpinBoxTriggerLevel.setProperty("value", 0.5)
+        self.doubleSpinBoxTriggerLevel.setObjectName("doubleSpinBoxTriggerLevel")
+        self.gridLayout.addWidget(self.doubleSpinBoxTriggerLevel, 18, 3, 1, 2)
+        self.labelPreTrigger = QtWidgets.QLabel(self.widget)
+        self.labelPreTrigger.setObjectName("labelPreTrigger")
+        self.gridLayout.addWidget(self.labelPreTrigger, 19, 0, 1, 5)
+        self.doubleSpinBoxPreTrigger = QtWidgets.QDoubleSpinBox(self.widget)
+        self.doubleSpinBoxPreTrigger.setAlignment(QtCore.Qt.AlignRight|QtCore.Qt.AlignTrailing|QtCore.Qt.AlignVCenter)
+        self.doubleSpinBoxPreTrigger.setDecimals(2)
+        self.doubleSpinBoxPreTrigger.setMaximum(5.0)
+        self.doubleSpinBoxPreTrigger.setSingleStep(0.1)
+        self.doubleSpinBoxPreTrigger.setProperty("value", 0.5)
+        self.doubleSpinBoxPreTrigger.setObjectName("doubleSpinBoxPreTrigger")
+        self.gridLayout.addWidget(self.doubleSpinBoxPreTrigger, 20, 0, 1, 5)
+        self.labelRepeatEvery = QtWidgets.QLabel(self.widget)
+        self.labelRepeatEvery.setObjectName("labelRepeatEvery")
+        self.gridLayout.addWidget(self.labelRepeatEvery, 21, 0, 1, 5)
+        self.spinBoxRepeatEvery = QtWidgets.QSpinBox(self.widget)
+        self.spinBoxRepeatEvery.setAlignment(QtCore.Qt.AlignRight|QtCore.Qt.AlignTrailing|QtCore.Qt.AlignVCenter)
+        self.spinBoxRepeatEvery.setMaximum(10080)
+        self.spinBoxRepeatEvery.setObjectName("spinBoxRepeatEvery")
+        self.gridLayout.addWidget(self.spinBoxRepeatEvery, 22, 0, 1, 3)
+        self.spinBoxRuns = QtWidgets.QSpinBox(self.widget)
+        self.spinBoxRuns.setAlignment(QtCore.Qt.AlignRight|QtCore.Qt.AlignTrailing|QtCore.Qt.AlignVCenter)
+        self.spinBoxRuns.setMaximum(100000)
+        self.spinBoxRuns.setObjectName("spinBoxRuns")
+        self.gridLayout.addWidget(self.spinBoxRuns, 22, 3, 1, 2)
         self.doubleSpinBoxSampleRate = QtWidgets.QDoubleSpinBox(self.widget)
         self.doubleSpinBoxSampleRate.setAlignment(QtCore.Qt.AlignRight|QtCore.Qt.AlignTrailing|QtCore.Qt.AlignVCenter)
         self.doubleSpinBoxSampleRate.setDecimals(2)
@@ -68,6 +135,9 @@ class Ui_MainWindow(object):
         self.checkBoxAutoScale.setChecked(True)
         self.checkBoxAutoScale.setObjectName("checkBoxAutoScale")
         self.gridLayout.addWidget(self.checkBoxAutoScale, 7, 0, 1, 1)
+        self.checkBoxFullRate = QtWidgets.QCheckBox(self.widget)
+        self.checkBoxFullRate.setObjectName("checkBoxFullRate")
+        self.gridLayout.addWidget(self.checkBoxFullRate, 8, 0, 1, 5)
         self.labelStopRecordingAfter = QtWidgets.QLabel(self.widget)
         self.labelStopRecordingAfter.setObjectName("labelStopRecordingAfter")
         self.gridLayout.addWidget(self.labelStopRecordingAfter, 9, 0, 1, 5)
@@ -205,8 +275,33 @@ class Ui_MainWindow(object):
         self.labelWindowTime.setText(_translate("MainWindow", "Window Time (X)"))
         self.lsbrlSampleRate.setText(_translate("MainWindow", "Sample Rate"))
         self.labelAbout.setText(_translate("MainWindow", "About:"))
+        self.labelChannels.setText(_translate("MainWindow", "Channels"))
+        self.spinBoxChannels.setToolTip(_translate("MainWindow", "Number of channels captured from the input device, one curve each"))
+        self.labelDevice.setText(_translate("MainWindow", "Input Device"))
+        self.labelDeviceRate.setText(_translate("MainWindow", "Device Rate"))
+        self.comboBoxDeviceRate.setToolTip(_translate("MainWindow", "Sample rate of the input device, the plot is reduced to the sample rate"))
+        self.labelTrigger.setText(_translate("MainWindow", "Trigger"))
+        self.comboBoxTrigger.setToolTip(_translate("MainWindow", "Starts recording when the first channel crosses the trigger level"))
+        self.comboBoxTrigger.setItemText(0, _translate("MainWindow", "Off"))
+        self.comboBoxTrigger.setItemText(1, _translate("MainWindow", "Level rising"))
+        self.comboBoxTrigger.setItemText(2, _translate("MainWindow", "Level falling"))
+        self.comboBoxTrigger.setItemText(3, _translate("MainWindow", "Slope rising"))
+        self.comboBoxTrigger.setItemText(4, _translate("MainWindow", "Slope falling"))
+        self.comboBoxTrigger.setItemText(5, _translate("MainWindow", "RMS rising"))
+        self.comboBoxTrigger.setItemText(6, _translate("MainWindow", "RMS falling"))
+        self.doubleSpinBoxTriggerLevel.setToolTip(_translate("MainWindow", "Trigger level, in V (V/s for slope)"))
+        self.labelPreTrigger.setText(_translate("MainWindow", "Pre-Trigger Time"))
+        self.doubleSpinBoxPreTrigger.setToolTip(_translate("MainWindow", "Time recorded before the trigger"))
+        self.doubleSpinBoxPreTrigger.setSuffix(_translate("MainWindow", "s"))
+        self.labelRepeatEvery.setText(_translate("MainWindow", "Repeat Every (0 = Once)"))
+        self.spinBoxRepeatEvery.setToolTip(_translate("MainWindow", "Records a run of the stop recording time every this many minutes, each one saved to its own file"))
+        self.spinBoxRepeatEvery.setSuffix(_translate("MainWindow", "min"))
+        self.spinBoxRuns.setToolTip(_translate("MainWindow", "Number of runs, 0 repeats until stopped"))
+        self.spinBoxRuns.setSuffix(_translate("MainWindow", "runs"))
         self.doubleSpinBoxSampleRate.setSuffix(_translate("MainWindow", "Hz"))
         self.checkBoxAutoScale.setText(_translate("MainWindow", "Auto"))
+        self.checkBoxFullRate.setToolTip(_translate("MainWindow", "Record every sample from the input device, the plot stays at the sample rate"))
+        self.checkBoxFullRate.setText(_translate("MainWindow", "Record Full Rate"))
         self.labelStopRecordingAfter.setText(_translate("MainWindow", "Stop Recording After (0 = Manual)"))
         self.doubleSpinBoxSampleInterval.setSuffix(_translate("MainWindow", "s"))
         self.labelScale.setText(_translate("MainWindow", " Scale (Y)"))